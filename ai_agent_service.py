@@ -8,6 +8,11 @@ import google.generativeai as genai
 from dataclasses import dataclass
 import hashlib
 import os
+import logging
+import itertools
+from collections import deque
+
+log = logging.getLogger("xcode_assistant.ai")
 
 @dataclass
 class FileContext:
@@ -30,21 +35,34 @@ class AIAgentService:
         
         # Context storage
         self.file_contexts: Dict[str, FileContext] = {}
-        self.conversation_history: List[Dict] = []
+        self.conversation_history: deque = deque(maxlen=1000)  # Oldest turns drop off automatically
         
         # Enhanced context management
         self.max_context_files = 300  # Increased for larger repositories
         self.context_refresh_interval = 180  # 3 minutes for more frequent updates
         self.last_context_refresh = datetime.now()
         
+        # Bumped on every change to file_contexts so readers can cache derived data
+        self.ctx_version = 0
+        
         # Code extraction patterns
         self.code_block_pattern = re.compile(r'```(?:swift|objc|objective-c|python|javascript)?\n(.*?)\n```', re.DOTALL)
         self.file_header_pattern = re.compile(r'(?:FileName?|File|PATH?):\s*([^\n]+)', re.IGNORECASE)
         
     async def update_file_context(self, repo_name: str, file_path: str, content: str):
         """Enhanced file context updating with better memory management"""
-        import hashlib
+        self._store_file_context(repo_name, file_path, content)
         
+        # Manage context size
+        await self._manage_context_size()
+    
+    async def update_file_contexts(self, repo_name: str, items: List[Tuple[str, str]]):
+        """Store many (file_path, content) pairs, trimming the context once for the whole batch"""
+        for file_path, content in items:
+            self._store_file_context(repo_name, file_path, content)
+        await self._manage_context_size()
+    
+    def _store_file_context(self, repo_name: str, file_path: str, content: str):
         key = f"{repo_name}:{file_path}"
         file_hash = hashlib.md5(content.encode()).hexdigest()
         file_size = len(content)
@@ -55,7 +73,7 @@ class AIAgentService:
         if file_size > max_size:
             # For large files, store a truncated version with key sections
             content = self._extract_key_sections(content, file_path)
-            print(f"Truncated large file: {file_path} ({file_size} -> {len(content)} bytes)")
+            log.debug("Truncated large file: %s (%d -> %d bytes)", file_path, file_size, len(content))
         
         # Update or add file context
         self.file_contexts[key] = FileContext(
@@ -66,10 +84,19 @@ class AIAgentService:
             file_hash=file_hash,
             file_size=len(content)
         )
-        
-        # Manage context size
-        await self._manage_context_size()
-        
+        self.ctx_version += 1
+        
+    def clear_context(self) -> Dict[str, FileContext]:
+        """Swap in an empty context and return the old one, so the caller decides where it gets torn down"""
+        old_contexts = self.file_contexts
+        self.file_contexts = {}
+        self.ctx_version += 1
+        return old_contexts
+    
+    def get_conversation_history(self, limit: int = 50) -> List[Dict]:
+        """Most recent conversation entries first, touching only the last `limit` items"""
+        return list(itertools.islice(reversed(self.conversation_history), limit))
+    
     def _extract_key_sections(self, content: str, file_path: str) -> str:
         """Extract key sections from large files to preserve important information"""
         lines = content.split('\n')
@@ -137,8 +164,9 @@ class AIAgentService:
         
         removed_count = len(self.file_contexts) - len(new_contexts)
         self.file_contexts = new_contexts
+        self.ctx_version += 1
         
-        print(f"Context management: Removed {removed_count} files, kept {len(new_contexts)} most relevant files")
+        log.info("Context management: Removed %d files, kept %d most relevant files", removed_count, len(new_contexts))
     
     def _calculate_file_relevance_score(self, context: FileContext) -> float:
         """Calculate relevance score for file context prioritization"""
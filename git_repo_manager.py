@@ -1,16 +1,128 @@
 import os
-import git
-import json
+import orjson
 import asyncio
 import aiohttp
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Set
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass
 from pathlib import Path
 import shutil
-import hashlib
 import fnmatch
+import re
 import tempfile
 import time
+import heapq
+import logging
+import stat
+import threading
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger("xcode_assistant.repos")
+
+def _file_suffix(file_path: str) -> str:
+    """Lower-cased extension of a path; dotfiles like .gitignore count as their own suffix"""
+    name = os.path.basename(file_path)
+    ext = os.path.splitext(name)[1]
+    if not ext and name.startswith('.'):
+        ext = name
+    return ext.lower()
+
+# Encodings tried in order when reading repository files as text
+TEXT_ENCODINGS = ('utf-8', 'utf-16', 'iso-8859-1', 'cp1252')
+
+# Repository names become directory names under base_path; '.' and '..' would escape it
+REPO_NAME_PATTERN = r"^(?!\.{1,2}$)[A-Za-z0-9._-]+$"
+_match_repo_name = re.compile(REPO_NAME_PATTERN).match
+
+HTTP_MAX_CONNECTIONS = 32  # Pooled connections for GitHub API calls
+HTTP_TIMEOUT = 30  # Seconds per API request
+
+class RepoError(ValueError):
+    """Raised for invalid repository requests, such as duplicate names or unsupported URLs"""
+
+class GitError(Exception):
+    """Raised when a git subprocess exits with a non-zero status"""
+
+@dataclass(slots=True)
+class RepoConfig:
+    """Configuration and sync statistics for a monitored repository"""
+    url: str
+    branch: str
+    access_token: Optional[str]
+    sync_interval: int
+    local_path: Path
+    created_at: datetime
+    sync_count: int = 0
+    error_count: int = 0
+    consecutive_failures: int = 0
+    last_error: Optional[str] = None
+    files_processed: int = 0
+    critical_files: int = 0
+    sync_duration: float = 0.0
+
+# File classification by suffix
+CRITICAL_EXTENSIONS = frozenset({
+    '.swift', '.m', '.h', '.mm'  # iOS/macOS native files - highest priority
+})
+IMPORTANT_EXTENSIONS = frozenset({
+    '.py', '.js', '.ts', '.json',  # Backend/config
+    '.plist', '.xml', '.yaml', '.yml',  # Config files
+    '.md', '.txt', '.gitignore'  # Documentation
+})
+
+# Source and project files worth loading into the AI context
+CODE_EXTENSIONS = CRITICAL_EXTENSIONS | frozenset({'.py', '.js', '.ts', '.json', '.plist'})
+
+_SUFFIX_TYPES = {
+    **{suffix: "important" for suffix in IMPORTANT_EXTENSIONS},
+    **{suffix: "critical" for suffix in CRITICAL_EXTENSIONS},
+}
+
+def _classify_suffix(suffix: str) -> str:
+    """Map a suffix to its file class: critical, important or other"""
+    return _SUFFIX_TYPES.get(suffix, "other")
+
+# Directory and file names that are always skipped during a walk
+EXCLUDE_DIRS = frozenset({
+    '.git', 'node_modules', '__pycache__', '.vscode', '.idea',
+    'build', 'Build', 'DerivedData', '.build', 'dist',
+    'Pods', 'Carthage', '.bundle'
+})
+EXCLUDE_FILES = frozenset({'.DS_Store', 'Package.resolved', 'Podfile.lock'})
+
+def _compile_patterns(patterns) -> str:
+    """Combine glob patterns into a single regex source string (picklable for worker processes)"""
+    return '|'.join(fnmatch.translate(pattern) for pattern in sorted(patterns))
+
+def _walk_repository(local_path: str, file_regex: str, dir_regex: str) -> List[Tuple[str, str, int]]:
+    """Walk a checkout and return (relative_path, suffix, size) for files that pass the filters.
+    
+    Module-level and argument-only so it can run in a ProcessPoolExecutor worker.
+    """
+    match_file = re.compile(file_regex).match
+    match_dir = re.compile(dir_regex).match
+    entries = []
+    
+    for root, dirs, filenames in os.walk(local_path):
+        # Remove excluded directories
+        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS and not match_dir(d)]
+        
+        rel_root = os.path.relpath(root, local_path)
+        
+        for filename in filenames:
+            if filename in EXCLUDE_FILES or match_file(filename):
+                continue
+            
+            rel_path = filename if rel_root == '.' else os.path.join(rel_root, filename)
+            try:
+                size = os.stat(os.path.join(root, filename)).st_size
+            except OSError:
+                size = 0
+            entries.append((rel_path, _file_suffix(filename), size))
+    
+    return entries
 
 class GitRepoManager:
     def __init__(self, base_path: str = None):
@@ -24,29 +136,51 @@ class GitRepoManager:
         # Create directory with proper permissions
         try:
             self.base_path.mkdir(exist_ok=True, parents=True)
-            print(f"✅ Using repository directory: {self.base_path}")
+            log.info("✅ Using repository directory: %s", self.base_path)
         except PermissionError:
             # Fallback to a different directory if we can't create this one
             fallback_path = Path(tempfile.gettempdir()) / "xcode_repos"
             fallback_path.mkdir(exist_ok=True, parents=True)
             self.base_path = fallback_path
-            print(f"⚠️ Using fallback repository directory: {self.base_path}")
+            log.warning("⚠️ Using fallback repository directory: %s", self.base_path)
         
-        self.repos_config = {}
-        self.last_sync = {}
+        self.repos_config: Dict[str, RepoConfig] = {}
+        self.last_sync = {}  # Wall-clock times, for display only
+        self._last_sync_mono: Dict[str, float] = {}  # Monotonic times for interval math
+        self._due_heap: List[Tuple[float, str]] = []  # (next_due, repo_name) min-heap
+        self._next_due: Dict[str, float] = {}  # Latest due time per repo; older heap entries are stale
         self.file_hashes = {}
-        self.sync_locks = {}  # Prevent concurrent syncs
+        self.sync_locks: Dict[str, asyncio.Lock] = {}  # Prevent concurrent syncs, created on first sync
         self.sync_progress = {}  # Track sync progress
         
         # Enhanced file filtering configuration
-        self.critical_extensions = {
-            '.swift', '.m', '.h', '.mm'  # iOS/macOS native files - highest priority
-        }
+        self.critical_extensions = CRITICAL_EXTENSIONS
+        self.important_extensions = IMPORTANT_EXTENSIONS
+        
+        # Suffix of every walked path, filled once per walk and reused by classification
+        self._suffix_cache: Dict[str, str] = {}
+        self._suffix_cache_limit = 50000
         
-        self.important_extensions = {
-            '.py', '.js', '.ts', '.json',  # Backend/config
-            '.plist', '.xml', '.yaml', '.yml',  # Config files
-            '.md', '.txt', '.gitignore'  # Documentation
+        # Per-repo classification of the last walk, so stats and structure reads skip the filesystem
+        self._file_index: Dict[str, Dict] = {}
+        
+        # Decoded file contents keyed by (repo, path, mtime_ns, size); a changed file misses on its own.
+        # Bounded by the on-disk size of the cached files, evicting least recently used first.
+        # Read from worker threads, hence the lock
+        self._content_cache: OrderedDict = OrderedDict()
+        self._content_cache_bytes = 0
+        self._content_cache_max_bytes = 64 * 1024 * 1024
+        self._content_cache_lock = threading.Lock()
+        
+        # Structure responses keyed by (last sync, sync count, error count); dropped with the file index
+        self._structure_cache: Dict[str, Tuple[tuple, Dict]] = {}
+        
+        # Sort priority by suffix - critical and important sets take precedence
+        self._suffix_priority = {
+            **{ext: 2 for ext in ('.json', '.plist', '.xml', '.yaml', '.yml')},  # Config files
+            **{ext: 3 for ext in ('.md', '.txt')},  # Documentation
+            **{ext: 1 for ext in self.important_extensions},
+            **{ext: 0 for ext in self.critical_extensions},
         }
         
         self.exclude_patterns = {
@@ -59,6 +193,17 @@ class GitRepoManager:
             '*.pdf', '*.zip', '*.tar.gz'  # Binaries
         }
         
+        # Precompiled exclusion regexes; directories match on the first path segment of each pattern
+        self._exclude_file_regex = _compile_patterns(self.exclude_patterns)
+        self._exclude_dir_regex = _compile_patterns({p.split('/')[0] for p in self.exclude_patterns})
+        self._match_excluded_file = re.compile(self._exclude_file_regex).match
+        self._match_excluded_dir = re.compile(self._exclude_dir_regex).match
+        
+        # Large repositories are walked in worker processes to get around the GIL
+        self._walk_pool: Optional[ProcessPoolExecutor] = None
+        self._walk_pool_threshold = 1000  # Files seen on the previous walk
+        self._file_counts: Dict[str, int] = {}
+        
         # File size limits based on importance
         self.file_size_limits = {
             'critical': 500 * 1024,    # 500KB for Swift/ObjC files
@@ -68,51 +213,75 @@ class GitRepoManager:
         
         # GitHub API integration for faster file access
         self.github_api_token = None
+        self._tree_etag: Dict[str, str] = {}  # Last ETag of each repo's tree listing
+        self._tree_cache: Dict[str, List[Dict]] = {}  # Parsed tree listing for that ETag
+        self._http: Optional[aiohttp.ClientSession] = None  # Shared keep-alive client, created on first use
         
     def set_github_token(self, token: str):
         """Set GitHub API token for faster file access"""
         self.github_api_token = token
+    
+    def _http_session(self) -> aiohttp.ClientSession:
+        """Long-lived client session so API calls reuse pooled connections instead of a new TLS handshake each time"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=HTTP_MAX_CONNECTIONS),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+            )
+        return self._http
+    
+    async def close(self):
+        """Close the shared client session and the walk pool; call on shutdown from the loop that used them"""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        if self._walk_pool is not None:
+            # Waiting for a running walk blocks, so keep it off the event loop
+            await asyncio.to_thread(self._walk_pool.shutdown, cancel_futures=True)
+            self._walk_pool = None
         
     def add_repository(self, name: str, url: str, branch: str = "main", 
                       access_token: str = None, sync_interval: int = 300):
         """Add a git repository to monitor with enhanced validation"""
+        if not _match_repo_name(name):
+            raise RepoError("Repository name may only contain letters, digits, '.', '_' and '-', and cannot be '.' or '..'")
         if name in self.repos_config:
-            raise ValueError(f"Repository {name} already exists")
+            raise RepoError(f"Repository {name} already exists")
             
         # Validate URL format
         if not (url.startswith('https://') or url.startswith('git@')):
-            raise ValueError("Repository URL must start with https:// or git@")
-            
-        self.repos_config[name] = {
-            "url": url,
-            "branch": branch,
-            "access_token": access_token,
-            "sync_interval": sync_interval,
-            "local_path": self.base_path / name,
-            "created_at": datetime.now(),
-            "sync_count": 0,
-            "error_count": 0,
-            "last_error": None,
-            "files_processed": 0,
-            "critical_files": 0,
-            "sync_duration": 0
-        }
+            raise RepoError("Repository URL must start with https:// or git@")
+            
+        self.repos_config[name] = RepoConfig(
+            url=url,
+            branch=branch,
+            access_token=access_token,
+            sync_interval=sync_interval,
+            local_path=self.base_path / name,
+            created_at=datetime.now()
+        )
         
-        # Initialize sync lock and progress tracking
-        self.sync_locks[name] = asyncio.Lock()
+        # Initialize progress tracking
         self.sync_progress[name] = {"status": "idle", "progress": 0, "message": ""}
+        self._schedule_sync(name, 0)
         
         # Set GitHub token if this is a GitHub repo
         if "github.com" in url and access_token:
             self.github_api_token = access_token
         
+    def _remove_checkout(self, local_path: Path):
+        """Delete a repository checkout, refusing any path that is not a direct child of base_path"""
+        if local_path.resolve().parent != self.base_path.resolve():
+            raise RepoError(f"Refusing to delete {local_path}: not a checkout under {self.base_path}")
+        shutil.rmtree(local_path, ignore_errors=True)
+    
     async def clone_or_update_repo_with_timeout(self, repo_name: str, max_duration: int = 25) -> Tuple[bool, str, int]:
         """Clone/update repository with timeout handling for Render's 30-second limit"""
         if repo_name not in self.repos_config:
             return False, f"Repository {repo_name} not configured", 0
             
         # Use lock to prevent concurrent syncs
-        async with self.sync_locks[repo_name]:
+        async with self._get_sync_lock(repo_name):
             try:
                 return await asyncio.wait_for(
                     self._do_sync_with_progress(repo_name),
@@ -131,9 +300,16 @@ class GitRepoManager:
                 
                 return False, f"Repository {repo_name} sync timeout - continuing in background", 0
     
+    def _get_sync_lock(self, repo_name: str) -> asyncio.Lock:
+        """Get the sync lock for a repository, creating it on first use"""
+        lock = self.sync_locks.get(repo_name)
+        if lock is None:
+            lock = self.sync_locks[repo_name] = asyncio.Lock()
+        return lock
+    
     async def _complete_sync_in_background(self, repo_name: str):
         """Complete sync operation in background without timeout constraints"""
-        print(f"🔄 Completing sync for {repo_name} in background...")
+        log.info("🔄 Completing sync for %s in background...", repo_name)
         
         try:
             success, message, file_count = await self._do_sync_with_progress(repo_name, background=True)
@@ -144,10 +320,10 @@ class GitRepoManager:
                 "message": message
             }
             
-            print(f"✅ Background sync completed for {repo_name}: {message}")
+            log.info("✅ Background sync completed for %s: %s", repo_name, message)
             
         except Exception as e:
-            print(f"❌ Background sync failed for {repo_name}: {e}")
+            log.error("❌ Background sync failed for %s: %s", repo_name, e)
             self.sync_progress[repo_name] = {
                 "status": "failed",
                 "progress": 0,
@@ -157,36 +333,22 @@ class GitRepoManager:
     async def _do_sync_with_progress(self, repo_name: str, background: bool = False) -> Tuple[bool, str, int]:
         """Internal sync method with progress tracking"""
         config = self.repos_config[repo_name]
-        local_path = config["local_path"]
+        local_path = config.local_path
         start_time = time.time()
         
         self.sync_progress[repo_name] = {"status": "syncing", "progress": 10, "message": "Starting sync..."}
         
         try:
-            if local_path.exists():
-                # Repository exists, pull latest changes
+            if (local_path / ".git").exists():
+                # Repository exists, fetch the branch tip and move the checkout onto it
                 self.sync_progress[repo_name]["message"] = "Pulling latest changes..."
                 self.sync_progress[repo_name]["progress"] = 30
                 
-                repo = git.Repo(local_path)
-                
-                # Verify we're on the correct branch
-                current_branch = repo.active_branch.name
-                if current_branch != config["branch"]:
-                    self.sync_progress[repo_name]["message"] = f"Switching to branch {config['branch']}..."
-                    
-                    origin = repo.remotes.origin
-                    origin.fetch()
-                    
-                    if config["branch"] in [ref.name.split('/')[-1] for ref in origin.refs]:
-                        repo.git.checkout(config["branch"])
-                    else:
-                        return False, f"Branch {config['branch']} not found", 0
+                await self._git(local_path, "fetch", "--depth=1", "origin", config.branch)
                 
-                # Pull latest changes
+                # checkout -B also handles a branch change in the config
                 self.sync_progress[repo_name]["progress"] = 50
-                origin = repo.remotes.origin
-                pull_info = origin.pull(config["branch"])
+                await self._git(local_path, "checkout", "--force", "-B", config.branch, "FETCH_HEAD")
                 
                 message = f"Updated repository: {repo_name}"
                 
@@ -195,15 +357,20 @@ class GitRepoManager:
                 self.sync_progress[repo_name]["message"] = "Cloning repository..."
                 self.sync_progress[repo_name]["progress"] = 20
                 
-                auth_url = self._get_authenticated_url(config["url"], config.get("access_token"))
+                auth_url = self._get_authenticated_url(config.url, config.access_token)
                 
-                # Use shallow clone for faster performance
-                repo = git.Repo.clone_from(
-                    auth_url, 
-                    local_path, 
-                    branch=config["branch"],
-                    depth=1  # Shallow clone
-                )
+                # Use shallow clone for faster performance; remove partial checkouts on failure or timeout
+                if local_path.exists():
+                    self._remove_checkout(local_path)
+                try:
+                    await self._git(
+                        self.base_path, "clone", "--depth=1", "--single-branch",
+                        "-b", config.branch, auth_url, str(local_path),
+                        secret=config.access_token
+                    )
+                except BaseException:
+                    self._remove_checkout(local_path)
+                    raise
                 
                 message = f"Cloned repository: {repo_name}"
             
@@ -216,11 +383,14 @@ class GitRepoManager:
             # Update statistics
             duration = time.time() - start_time
             self.last_sync[repo_name] = datetime.now()
-            config["sync_count"] += 1
-            config["last_error"] = None
-            config["sync_duration"] = duration
-            config["files_processed"] = len(relevant_files)
-            config["critical_files"] = sum(1 for f in relevant_files if self._is_critical_file(f))
+            self._last_sync_mono[repo_name] = time.monotonic()
+            config.sync_count += 1
+            config.last_error = None
+            config.sync_duration = duration
+            config.consecutive_failures = 0
+            self._schedule_sync(repo_name, config.sync_interval)
+            config.files_processed = len(relevant_files)
+            config.critical_files = sum(1 for f in relevant_files if self._is_critical_file(f))
             
             self.sync_progress[repo_name] = {
                 "status": "completed", 
@@ -229,34 +399,67 @@ class GitRepoManager:
             }
             
             final_message = f"{message} ({len(relevant_files)} files processed in {duration:.1f}s)"
-            print(f"✅ {final_message}")
+            log.info("✅ %s", final_message)
             
             return True, final_message, len(relevant_files)
             
-        except git.exc.GitError as e:
+        except GitError as e:
             error_msg = f"Git error syncing repository {repo_name}: {str(e)}"
-            print(f"❌ {error_msg}")
-            config["error_count"] += 1
-            config["last_error"] = error_msg
+            log.error("❌ %s", error_msg)
+            config.error_count += 1
+            config.last_error = error_msg
             self.sync_progress[repo_name] = {"status": "failed", "progress": 0, "message": error_msg}
+            self._drop_file_index(repo_name)  # Checkout may be gone or partial; re-walk on next use
+            self._schedule_retry(repo_name)
             return False, error_msg, 0
             
         except Exception as e:
             error_msg = f"Error syncing repository {repo_name}: {str(e)}"
-            print(f"❌ {error_msg}")
-            config["error_count"] += 1
-            config["last_error"] = error_msg
+            log.error("❌ %s", error_msg)
+            config.error_count += 1
+            config.last_error = error_msg
             self.sync_progress[repo_name] = {"status": "failed", "progress": 0, "message": error_msg}
+            self._drop_file_index(repo_name)  # Checkout may be gone or partial; re-walk on next use
+            self._schedule_retry(repo_name)
             return False, error_msg, 0
     
+    async def _git(self, cwd: Path, *args: str, secret: Optional[str] = None) -> str:
+        """Run a git command as an asyncio subprocess; cancelling the caller kills the process"""
+        proc = await asyncio.create_subprocess_exec(
+            "git", *args,
+            cwd=str(cwd),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"}  # Fail instead of waiting on a credential prompt
+        )
+        
+        try:
+            stdout, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        
+        if proc.returncode:
+            error = stderr.decode(errors="replace").strip()
+            if secret:
+                error = error.replace(secret, "***")
+            raise GitError(f"git {args[0]} failed ({proc.returncode}): {error}")
+        
+        return stdout.decode(errors="replace")
+    
     async def _process_files_with_priority(self, repo_name: str, background: bool = False) -> List[str]:
         """Process files with priority system and smart batching"""
-        all_files = self._list_all_files(repo_name)
+        all_files = await self._list_all_files_async(repo_name)
         
-        # Categorize files by priority
-        critical_files = [f for f in all_files if self._is_critical_file(f)]
-        important_files = [f for f in all_files if self._is_important_file(f) and f not in critical_files]
-        other_files = [f for f in all_files if f not in critical_files and f not in important_files]
+        # Categorize files by priority in a single pass
+        buckets = {"critical": [], "important": [], "other": []}
+        classify = self.classify_file
+        for file_path in all_files:
+            buckets[classify(file_path)[1]].append(file_path)
+        critical_files = buckets["critical"]
+        important_files = buckets["important"]
+        other_files = buckets["other"]
         
         processed_files = []
         
@@ -278,18 +481,18 @@ class GitRepoManager:
             for file_path in other_files[:20]:
                 processed_files.append(file_path)
         
-        print(f"📁 {repo_name}: Processed {len(processed_files)} files "
-              f"({len(critical_files)} critical, {len(important_files)} important)")
+        log.info("📁 %s: Processed %d files (%d critical, %d important)",
+                 repo_name, len(processed_files), len(critical_files), len(important_files))
         
         return processed_files
     
     def _is_critical_file(self, file_path: str) -> bool:
         """Check if file is critical (Swift, Objective-C)"""
-        return any(file_path.endswith(ext) for ext in self.critical_extensions)
+        return self._get_suffix(file_path) in self.critical_extensions
     
     def _is_important_file(self, file_path: str) -> bool:
         """Check if file is important (Python, JS, config files)"""
-        return any(file_path.endswith(ext) for ext in self.important_extensions)
+        return self._get_suffix(file_path) in self.important_extensions
     
     def _get_authenticated_url(self, url: str, token: str) -> str:
         """Add authentication token to git URL"""
@@ -310,20 +513,19 @@ class GitRepoManager:
         if not self.repos_config:
             return {}
         
-        repos_to_sync = [repo_name for repo_name in self.repos_config if self._should_sync(repo_name)]
+        repos_to_sync, all_results = await self._filter_changed_repositories(self._pop_due_repositories())
         
         if not repos_to_sync:
-            print("📝 No repositories need syncing")
-            return {}
+            log.debug("📝 No repositories need syncing")
+            return all_results
         
-        print(f"🔄 Syncing {len(repos_to_sync)} repositories in batches of {batch_size}...")
+        log.info("🔄 Syncing %d repositories in batches of %d...", len(repos_to_sync), batch_size)
         
-        all_results = {}
         
         # Process repositories in batches
         for i in range(0, len(repos_to_sync), batch_size):
             batch = repos_to_sync[i:i + batch_size]
-            print(f"📦 Processing batch {i//batch_size + 1}: {batch}")
+            log.debug("📦 Processing batch %d: %s", i // batch_size + 1, batch)
             
             # Sync batch concurrently with timeout
             batch_tasks = [self.clone_or_update_repo_with_timeout(repo_name, max_duration) 
@@ -339,149 +541,346 @@ class GitRepoManager:
                         all_results[repo_name] = result
                 
             except Exception as e:
-                print(f"❌ Batch processing error: {e}")
+                log.error("❌ Batch processing error: %s", e)
                 for repo_name in batch:
                     all_results[repo_name] = (False, f"Batch error: {str(e)}", 0)
         
         return all_results
     
-    def _should_sync(self, repo_name: str) -> bool:
-        """Check if repository should be synced based on interval"""
-        if repo_name not in self.last_sync:
-            return True
-            
+    async def has_remote_changes(self, repo_name: str) -> bool:
+        """Cheap upstream check: compare the remote branch tip (ls-remote, no object transfer) with HEAD.
+        
+        Errs on the side of syncing - a missing checkout or any git error reports a change.
+        """
         config = self.repos_config[repo_name]
-        time_since_sync = datetime.now() - self.last_sync[repo_name]
+        if not (config.local_path / ".git").exists():
+            return True
         
-        # Force sync if there were previous errors
-        if config.get("error_count", 0) > 0 and time_since_sync.total_seconds() > 60:
+        try:
+            remote, local = await asyncio.gather(
+                self._git(config.local_path, "ls-remote", "origin", f"refs/heads/{config.branch}"),
+                self._git(config.local_path, "rev-parse", "HEAD")
+            )
+        except GitError:
             return True
+        
+        remote_sha = remote.split()[0] if remote.strip() else None
+        return remote_sha != local.strip()
+    
+    async def _filter_changed_repositories(self, repo_names: List[str]) -> Tuple[List[str], Dict[str, Tuple[bool, str, int]]]:
+        """Split due repositories into those whose upstream moved and results for the unchanged ones.
+        
+        Unchanged repositories skip the fetch but still count as freshly synced, and are reported with
+        their indexed file count so callers can (re)load their files into the AI context.
+        """
+        if not repo_names:
+            return [], {}
+        
+        changed = await asyncio.gather(*[self.has_remote_changes(name) for name in repo_names])
+        to_sync = []
+        unchanged_names = []
+        for repo_name, has_changes in zip(repo_names, changed):
+            if has_changes:
+                to_sync.append(repo_name)
+                continue
+            self.last_sync[repo_name] = datetime.now()
+            self._last_sync_mono[repo_name] = time.monotonic()
+            self._schedule_sync(repo_name, self.repos_config[repo_name].sync_interval)
+            unchanged_names.append(repo_name)
+        
+        indexes = await asyncio.gather(*[asyncio.to_thread(self.get_file_index, name) for name in unchanged_names])
+        unchanged = {
+            name: (True, f"Repository {name} unchanged upstream", len(index["files"]))
+            for name, index in zip(unchanged_names, indexes)
+        }
+        
+        if unchanged:
+            log.debug("⏭️ %d repositories unchanged upstream", len(unchanged))
+        return to_sync, unchanged
+    
+    def _schedule_sync(self, repo_name: str, delay: float):
+        """Schedule the next sync of a repository delay seconds from now"""
+        due = time.monotonic() + delay
+        self._next_due[repo_name] = due
+        heapq.heappush(self._due_heap, (due, repo_name))
+    
+    def _schedule_retry(self, repo_name: str):
+        """Reschedule a failed sync with exponential backoff on consecutive failures, capped at an hour"""
+        config = self.repos_config[repo_name]
+        config.consecutive_failures = min(config.consecutive_failures + 1, 4)
+        self._schedule_sync(repo_name, min(config.sync_interval * (1 << config.consecutive_failures), 3600))
+    
+    def _pop_due_repositories(self) -> List[str]:
+        """Pop repositories whose next sync is due, stopping at the first future entry"""
+        now = time.monotonic()
+        due_repos = []
+        
+        while self._due_heap and self._due_heap[0][0] <= now:
+            due, repo_name = heapq.heappop(self._due_heap)
+            
+            # Skip entries superseded by a later reschedule or for removed repos
+            if self._next_due.get(repo_name) != due or repo_name not in self.repos_config:
+                continue
             
-        return time_since_sync.total_seconds() > config["sync_interval"]
+            due_repos.append(repo_name)
+            # Fallback retry in case the sync never reports back; a finished sync reschedules
+            self._schedule_sync(repo_name, 60)
+        
+        return due_repos
     
-    def get_file_content(self, repo_name: str, file_path: str) -> Optional[str]:
-        """Get content of a specific file with enhanced encoding handling"""
+    def get_file_content(self, repo_name: str, file_path: str, max_size: Optional[int] = None) -> Optional[str]:
+        """Get content of a specific file with enhanced encoding handling; max_size can only tighten the per-type limit"""
         if repo_name not in self.repos_config:
             return None
             
-        local_path = self.repos_config[repo_name]["local_path"]
+        local_path = self.repos_config[repo_name].local_path
         full_path = local_path / file_path
         
         try:
-            if not full_path.exists() or not full_path.is_file():
+            try:
+                file_stat = full_path.stat()
+            except FileNotFoundError:
+                return None
+            if not stat.S_ISREG(file_stat.st_mode):
                 return None
                 
             # Check file size based on type
-            file_size = full_path.stat().st_size
-            max_size = self._get_max_file_size(file_path)
+            file_size = file_stat.st_size
+            type_limit = self.get_max_file_size(file_path)
+            max_size = type_limit if max_size is None else min(max_size, type_limit)
             
             if file_size > max_size:
                 return f"File too large ({file_size} bytes, max {max_size}) - skipped for context"
             
-            # Try different encodings
-            encodings = ['utf-8', 'utf-16', 'iso-8859-1', 'cp1252']
+            key = (repo_name, file_path, file_stat.st_mtime_ns, file_size)
+            with self._content_cache_lock:
+                content = self._content_cache.get(key)
+                if content is not None:
+                    self._content_cache.move_to_end(key)
+                    return content
             
-            for encoding in encodings:
-                try:
-                    with open(full_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                        return content
-                except UnicodeDecodeError:
-                    continue
-            
-            # If all encodings fail
-            return f"Unable to decode file {file_path} - binary or unsupported encoding"
+            content = self._read_text(full_path, file_path)
+            if file_size <= self._content_cache_max_bytes:
+                with self._content_cache_lock:
+                    if key not in self._content_cache:
+                        self._content_cache[key] = content
+                        self._content_cache_bytes += file_size
+                    while self._content_cache_bytes > self._content_cache_max_bytes:
+                        evicted_key, _ = self._content_cache.popitem(last=False)
+                        self._content_cache_bytes -= evicted_key[3]
+            return content
                 
         except Exception as e:
-            print(f"❌ Error reading file {file_path} from {repo_name}: {str(e)}")
+            log.debug("❌ Error reading file %s from %s: %s", file_path, repo_name, e)
         
         return None
     
-    def _get_max_file_size(self, file_path: str) -> int:
+    def _read_text(self, full_path: Path, file_path: str) -> str:
+        """Read a file as text, trying each of TEXT_ENCODINGS in turn"""
+        for encoding in TEXT_ENCODINGS:
+            try:
+                with open(full_path, 'r', encoding=encoding) as f:
+                    return f.read()
+            except UnicodeDecodeError:
+                continue
+        
+        # If all encodings fail
+        return f"Unable to decode file {file_path} - binary or unsupported encoding"
+    
+    def decode_file_content(self, file_path: str, raw: bytes) -> str:
+        """Decode bytes read elsewhere (e.g. asynchronously) the same way get_file_content reads text"""
+        for encoding in TEXT_ENCODINGS:
+            try:
+                content = raw.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+            # Match text-mode universal newline handling
+            return content.replace('\r\n', '\n').replace('\r', '\n')
+        return f"Unable to decode file {file_path} - binary or unsupported encoding"
+    
+    def resolve_file_path(self, repo_name: str, file_path: str) -> Optional[Path]:
+        """Resolve a repository file to an absolute path, rejecting paths outside the checkout"""
+        if repo_name not in self.repos_config:
+            return None
+        
+        local_path = self.repos_config[repo_name].local_path.resolve()
+        full_path = (local_path / file_path).resolve()
+        
+        if local_path not in full_path.parents or not full_path.is_file():
+            return None
+        return full_path
+    
+    def iter_file_content(self, repo_name: str, file_path: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield a repository file's raw bytes in chunks, so callers never hold the whole file"""
+        full_path = self.resolve_file_path(repo_name, file_path)
+        if not full_path:
+            return
+        with open(full_path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+    
+    def get_file_stat(self, repo_name: str, file_path: str, preview_bytes: int = 260) -> Optional[Tuple[int, Optional[str]]]:
+        """Get a file's size and a short text preview without reading the whole file.
+        
+        The preview is None for binary files (NUL byte in the head). Returns None if the file does not exist.
+        """
+        full_path = self.resolve_file_path(repo_name, file_path)
+        if full_path is None:
+            return None
+        
+        try:
+            with open(full_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                head = f.read(preview_bytes)
+        except OSError:
+            return None
+        
+        if b'\0' in head:
+            return size, None
+        return size, head.decode('utf-8', errors='replace')
+    
+    def get_max_file_size(self, file_path: str) -> int:
         """Get maximum file size based on file type"""
-        if self._is_critical_file(file_path):
-            return self.file_size_limits['critical']
-        elif self._is_important_file(file_path):
-            return self.file_size_limits['important']
-        else:
-            return self.file_size_limits['regular']
+        _, file_type = self.classify_file(file_path)
+        return self.file_size_limits.get(file_type, self.file_size_limits['regular'])
     
     def _list_all_files(self, repo_name: str) -> List[str]:
         """List all relevant files in repository with smart filtering"""
         if repo_name not in self.repos_config:
             return []
             
-        local_path = self.repos_config[repo_name]["local_path"]
+        local_path = self.repos_config[repo_name].local_path
         if not local_path.exists():
             return []
         
-        files = []
-        
         try:
-            for root, dirs, filenames in os.walk(local_path):
-                # Remove excluded directories
-                dirs[:] = [d for d in dirs if not self._should_exclude_dir(d)]
-                
-                for filename in filenames:
-                    if self._should_exclude_file(filename):
-                        continue
-                        
-                    file_path = Path(root) / filename
-                    rel_path = file_path.relative_to(local_path)
-                    files.append(str(rel_path))
+            entries = _walk_repository(str(local_path), self._exclude_file_regex, self._exclude_dir_regex)
+        except Exception as e:
+            log.error("❌ Error walking repository %s: %s", repo_name, e)
+            return []
+        
+        return self._index_walk(repo_name, entries)
+    
+    async def _list_all_files_async(self, repo_name: str) -> List[str]:
+        """List repository files, walking large repositories in a worker process"""
+        if repo_name not in self.repos_config:
+            return []
+        
+        # Small repos (or ones never walked) are cheaper to walk in-process than to ship to a worker,
+        # but still off the event loop - a first walk after cloning can be large
+        if self._file_counts.get(repo_name, 0) < self._walk_pool_threshold:
+            return await asyncio.to_thread(self._list_all_files, repo_name)
+        
+        local_path = self.repos_config[repo_name].local_path
+        if not local_path.exists():
+            return []
+        
+        if self._walk_pool is None:
+            self._walk_pool = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
         
+        try:
+            loop = asyncio.get_running_loop()
+            entries = await loop.run_in_executor(
+                self._walk_pool, _walk_repository,
+                str(local_path), self._exclude_file_regex, self._exclude_dir_regex
+            )
         except Exception as e:
-            print(f"❌ Error walking repository {repo_name}: {e}")
+            log.error("❌ Error walking repository %s: %s", repo_name, e)
             return []
         
-        return self._sort_files_by_priority(files)
+        return self._index_walk(repo_name, entries)
     
-    def list_files(self, repo_name: str, extensions: List[str] = None, 
-                  exclude_dirs: List[str] = None) -> List[str]:
-        """Public interface for listing files"""
-        return self._list_all_files(repo_name)
+    def _index_walk(self, repo_name: str, entries: List[Tuple[str, str, int]]) -> List[str]:
+        """Record suffixes and sizes from a walk and return the paths sorted by priority"""
+        if len(self._suffix_cache) >= self._suffix_cache_limit:
+            self._suffix_cache.clear()
+        
+        sizes = {}
+        for rel_path, suffix, size in entries:
+            self._suffix_cache[rel_path] = suffix
+            sizes[rel_path] = size
+        self._file_counts[repo_name] = len(entries)
+        
+        files = self._sort_files_by_priority(list(sizes))
+        self._file_index[repo_name] = self._build_file_index(files, sizes)
+        self._structure_cache.pop(repo_name, None)
+        return files
+    
+    def _build_file_index(self, files: List[str], sizes: Dict[str, int] = None) -> Dict:
+        """Snapshot walked files once: type buckets, suffix counts, a path -> type map and sizes.
+        
+        Rebuilt only when the checkout is walked (i.e. on sync), so request handlers read it without touching disk.
+        """
+        sizes = sizes or {}
+        by_type = {"critical": [], "important": [], "other": []}
+        ext_counts = {}
+        type_map = {}
+        
+        for file_path in files:
+            suffix = self._get_suffix(file_path)
+            file_type = _classify_suffix(suffix)
+            by_type[file_type].append(file_path)
+            ext_counts[suffix] = ext_counts.get(suffix, 0) + 1
+            type_map[file_path] = file_type
+        
+        return {
+            "files": files,
+            "by_type": by_type,
+            "ext_counts": ext_counts,
+            "type_map": type_map,
+            "sizes": sizes,
+            "total_size": sum(sizes.values())
+        }
+    
+    def _drop_file_index(self, repo_name: str):
+        self._file_index.pop(repo_name, None)
+        self._structure_cache.pop(repo_name, None)
+    
+    def get_file_index(self, repo_name: str) -> Dict:
+        """Get the classification index for a repository, walking it if it has not been indexed yet"""
+        if repo_name not in self._file_index:
+            self._list_all_files(repo_name)
+        return self._file_index.get(repo_name) or self._build_file_index([])
+    
+    def classify_file(self, file_path: str) -> Tuple[str, str]:
+        """Get (suffix, file class) for a path with one cached suffix lookup and one dict lookup"""
+        suffix = self._get_suffix(file_path)
+        return suffix, _classify_suffix(suffix)
+    
+    def _get_suffix(self, file_path: str) -> str:
+        """Get the lower-cased suffix of a path, using the value cached by the last walk"""
+        suffix = self._suffix_cache.get(file_path)
+        if suffix is None:
+            if len(self._suffix_cache) >= self._suffix_cache_limit:
+                self._suffix_cache.clear()
+            suffix = self._suffix_cache[file_path] = _file_suffix(file_path)
+        return suffix
+    
+    def list_files(self, repo_name: str, extensions: Optional[frozenset] = None, 
+                  exclude_dirs: List[str] = None, limit: Optional[int] = None) -> List[str]:
+        """Public interface for listing files in priority order, optionally limited to a set of lower-cased suffixes.
+        
+        Served from the file index built by the last sync walk; the tree is only walked if it was never indexed.
+        """
+        files = self.get_file_index(repo_name)["files"]
+        if extensions is not None:
+            get_suffix = self._get_suffix
+            files = (file_path for file_path in files if get_suffix(file_path) in extensions)
+        return list(itertools.islice(files, limit))
     
     def _sort_files_by_priority(self, files: List[str]) -> List[str]:
         """Sort files by priority for processing"""
-        def get_priority(file_path: str) -> int:
-            if self._is_critical_file(file_path):
-                return 0  # Highest priority
-            elif self._is_important_file(file_path):
-                return 1  # Medium priority
-            elif file_path.endswith(('.json', '.plist', '.xml', '.yaml', '.yml')):
-                return 2  # Config files
-            elif file_path.endswith(('.md', '.txt')):
-                return 3  # Documentation
-            else:
-                return 4  # Lowest priority
-        
-        return sorted(files, key=get_priority)
+        priority = self._suffix_priority
+        get_suffix = self._get_suffix
+        return sorted(files, key=lambda file_path: priority.get(get_suffix(file_path), 4))
     
     def _should_exclude_dir(self, dirname: str) -> bool:
         """Check if directory should be excluded"""
-        exclude_dirs = {
-            '.git', 'node_modules', '__pycache__', '.vscode', '.idea',
-            'build', 'Build', 'DerivedData', '.build', 'dist',
-            'Pods', 'Carthage', '.bundle'
-        }
-        
-        return dirname in exclude_dirs or any(
-            fnmatch.fnmatch(dirname, pattern.split('/')[0]) 
-            for pattern in self.exclude_patterns
-        )
+        return dirname in EXCLUDE_DIRS or self._match_excluded_dir(dirname) is not None
     
     def _should_exclude_file(self, filename: str) -> bool:
         """Check if file should be excluded"""
-        # Direct filename exclusions
-        if filename in {'.DS_Store', 'Package.resolved', 'Podfile.lock'}:
-            return True
-            
-        # Pattern-based exclusions
-        for pattern in self.exclude_patterns:
-            if fnmatch.fnmatch(filename, pattern):
-                return True
-                
-        return False
+        return filename in EXCLUDE_FILES or self._match_excluded_file(filename) is not None
     
     async def get_repository_files_github_api(self, repo_name: str, repo_url: str, branch: str = "main") -> List[Dict]:
         """Get repository files using GitHub API for faster access"""
@@ -504,21 +903,38 @@ class GitRepoManager:
             "Accept": "application/vnd.github.v3+json"
         }
         
+        # Conditional request - a 304 is free against the rate limit and has no body
+        etag = self._tree_etag.get(repo_name)
+        if etag and repo_name in self._tree_cache:
+            headers["If-None-Match"] = etag
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(api_url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return [
-                            {"path": item["path"], "type": item["type"], "size": item.get("size", 0)}
-                            for item in data.get("tree", [])
-                            if item["type"] == "blob" and not self._should_exclude_file(item["path"].split("/")[-1])
-                        ]
+            async with self._http_session().get(api_url, headers=headers) as response:
+                if response.status == 304:
+                    return self._tree_cache[repo_name]
+                
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    files = [
+                        {"path": item["path"], "type": item["type"], "size": item.get("size", 0)}
+                        for item in data.get("tree", [])
+                        if item["type"] == "blob" and not self._should_exclude_file(item["path"].split("/")[-1])
+                    ]
+                    
+                    if response.headers.get("ETag"):
+                        self._tree_etag[repo_name] = response.headers["ETag"]
+                        self._tree_cache[repo_name] = files
+                    
+                    return files
         except Exception as e:
-            print(f"❌ GitHub API error for {repo_name}: {e}")
+            log.error("❌ GitHub API error for %s: %s", repo_name, e)
         
         return []
     
+    def get_repositories(self) -> Tuple[str, ...]:
+        """Names of all configured repositories, snapshotted so callers can iterate while repos are added"""
+        return tuple(self.repos_config)
+    
     def get_sync_progress(self, repo_name: str) -> Dict:
         """Get current sync progress for a repository"""
         return self.sync_progress.get(repo_name, {"status": "unknown", "progress": 0, "message": ""})
@@ -529,57 +945,47 @@ class GitRepoManager:
             return {}
             
         config = self.repos_config[repo_name]
-        files = self._list_all_files(repo_name)
-        
-        # Calculate detailed statistics
-        total_size = 0
-        file_types = {}
-        critical_files = 0
-        important_files = 0
-        
-        for file_path in files[:100]:  # Limit for performance
-            full_path = config["local_path"] / file_path
-            if full_path.exists():
-                size = full_path.stat().st_size
-                total_size += size
-                
-                ext = Path(file_path).suffix.lower()
-                file_types[ext] = file_types.get(ext, 0) + 1
-                
-                if self._is_critical_file(file_path):
-                    critical_files += 1
-                elif self._is_important_file(file_path):
-                    important_files += 1
-        
+        index = self.get_file_index(repo_name)
         last_sync_time = self.last_sync.get(repo_name)
-        progress = self.get_sync_progress(repo_name)
         
-        structure = {
+        # Everything but progress and health only changes when a sync finishes or fails
+        key = (last_sync_time, config.sync_count, config.error_count)
+        cached = self._structure_cache.get(repo_name)
+        if cached is None or cached[0] != key:
+            cached = (key, self._build_structure(repo_name, config, index, last_sync_time))
+            self._structure_cache[repo_name] = cached
+        
+        return {
+            **cached[1],
+            "sync_progress": self.get_sync_progress(repo_name),
+            "status": self._get_repo_health_status(repo_name)
+        }
+    
+    def _build_structure(self, repo_name: str, config: RepoConfig, index: Dict,
+                         last_sync_time: Optional[datetime]) -> Dict:
+        files = index["files"]
+        return {
             "repository": repo_name,
-            "url": config["url"],
-            "branch": config["branch"],
-            "local_path": str(config["local_path"]),
+            "url": config.url,
+            "branch": config.branch,
+            "local_path": str(config.local_path),
             "last_sync": last_sync_time.isoformat() if last_sync_time else "Never",
-            "sync_count": config.get("sync_count", 0),
-            "error_count": config.get("error_count", 0),
-            "last_error": config.get("last_error"),
-            "sync_duration": config.get("sync_duration", 0),
+            "sync_count": config.sync_count,
+            "error_count": config.error_count,
+            "last_error": config.last_error,
+            "sync_duration": config.sync_duration,
             "total_files": len(files),
-            "critical_files": critical_files,
-            "important_files": important_files,
-            "total_size_kb": total_size // 1024,
-            "file_types": file_types,
+            "critical_files": len(index["by_type"]["critical"]),
+            "important_files": len(index["by_type"]["important"]),
+            "total_size_kb": index["total_size"] // 1024,
+            "file_types": dict(index["ext_counts"]),
             "files": files[:50],  # Limit for UI
-            "sync_progress": progress,
-            "status": self._get_repo_health_status(repo_name),
             "performance_metrics": {
-                "files_per_second": config.get("files_processed", 0) / max(config.get("sync_duration", 1), 1),
-                "avg_sync_time": config.get("sync_duration", 0),
-                "success_rate": (config.get("sync_count", 0) - config.get("error_count", 0)) / max(config.get("sync_count", 1), 1) * 100
+                "files_per_second": config.files_processed / max(config.sync_duration, 1),
+                "avg_sync_time": config.sync_duration,
+                "success_rate": (config.sync_count - config.error_count) / max(config.sync_count, 1) * 100
             }
         }
-        
-        return structure
     
     def _get_repo_health_status(self, repo_name: str) -> str:
         """Get repository health status"""
@@ -593,13 +999,13 @@ class GitRepoManager:
             return "syncing"
         elif progress["status"] == "timeout":
             return "timeout_recovery"
-        elif config.get("error_count", 0) > 0:
+        elif config.error_count > 0:
             return "has_errors"
-        elif not self.last_sync.get(repo_name):
+        elif repo_name not in self._last_sync_mono:
             return "never_synced"
         else:
-            time_since_sync = datetime.now() - self.last_sync[repo_name]
-            if time_since_sync.total_seconds() > config["sync_interval"] * 2:
+            age = time.monotonic() - self._last_sync_mono[repo_name]
+            if age > config.sync_interval * 2:
                 return "sync_overdue"
             else:
                 return "healthy"
@@ -626,7 +1032,8 @@ class GitRepoManager:
         total_sync_time = 0
         last_successful_sync = None
         
-        for repo_name, config in self.repos_config.items():
+        # Runs in a worker thread: iterate a snapshot so a concurrent add_repository can't resize the dict under us
+        for repo_name, config in tuple(self.repos_config.items()):
             status = self._get_repo_health_status(repo_name)
             
             if status == "healthy":
@@ -636,11 +1043,11 @@ class GitRepoManager:
             elif "error" in status:
                 error_count += 1
             
-            files = self._list_all_files(repo_name)
-            total_files += len(files)
-            critical_files += sum(1 for f in files if self._is_critical_file(f))
+            index = self.get_file_index(repo_name)
+            total_files += len(index["files"])
+            critical_files += len(index["by_type"]["critical"])
             
-            sync_duration = config.get("sync_duration", 0)
+            sync_duration = config.sync_duration
             total_sync_time += sync_duration
             
             repo_last_sync = self.last_sync.get(repo_name)
@@ -1,39 +1,184 @@
-from fastapi import FastAPI, Request, BackgroundTasks, HTTPException
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Request, BackgroundTasks, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from typing import Annotated, List, Optional, Dict, Any, Tuple
 import asyncio
+import anyio
 import os
 from datetime import datetime
-import json
-import uuid
-from collections import deque
+import secrets
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import heapq
 import tempfile
-from pathlib import Path
 import time
+import hashlib
+import sys
+import logging
+import logging.handlers
+import queue
+import atexit
+import orjson
+import gzip
+import random
+import itertools
+import gc
+import re
+
+try:
+    import brotli
+except ImportError:  # Optional - gzip is always available
+    brotli = None
+
+try:
+    import aiofiles
+except ImportError:  # Optional - file reads then always go through worker threads
+    aiofiles = None
+
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:  # Optional - falls back to the default asyncio loop
+    uvloop = None
+
+try:
+    import prometheus_client
+except ImportError:  # Optional - /metrics is then not served
+    prometheus_client = None
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows - every process then runs its own sync
+    fcntl = None
 
 # Import our enhanced modules
-from git_repo_manager import GitRepoManager
+from git_repo_manager import GitRepoManager, RepoError, CODE_EXTENSIONS, REPO_NAME_PATTERN
 from ai_agent_service import AIAgentService
 
+# Log records are queued by the caller and formatted/written on a listener thread,
+# so logging never blocks the event loop on stderr
+_log_queue: queue.Queue = queue.Queue(-1)
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_log_queue_handler.setFormatter(logging.Formatter("%(message)s"))  # Merges args (and any traceback) before queuing
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), handlers=[_log_queue_handler])
+log = logging.getLogger("xcode_assistant")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the analysis workers and the scheduler in one task group for the life of the app.
+    
+    Leaving the group on shutdown cancels them together, so no background work outlives the server.
+    """
+    global job_queue
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=BLOCKING_IO_THREADS))
+    job_queue = asyncio.Queue(maxsize=MAX_JOBS_STORED)
+    
+    async with anyio.create_task_group() as tg:
+        for _ in range(JOB_WORKERS):
+            tg.start_soon(_job_worker)
+        log.info("✅ Started %d analysis workers", JOB_WORKERS)
+        
+        # All recurring work shares one scheduler task; repository sync runs in one worker process only
+        if acquire_sync_leadership():
+            scheduler.every(SYNC_INTERVAL, enhanced_periodic_sync, delay=random.uniform(0, SYNC_JITTER), jitter=SYNC_JITTER)
+        else:
+            log.info("Periodic sync is owned by another worker process")
+        scheduler.every(CLEANUP_INTERVAL, enhanced_job_cleanup)
+        tg.start_soon(scheduler.run)
+        
+        # Everything allocated so far (routes, models, index variants) lives for the whole process:
+        # move it out of the collector's reach so gen-2 passes only walk request and job garbage
+        gc.collect()
+        gc.freeze()
+        gc.set_threshold(GC_GEN0_THRESHOLD, 10, 10)
+        
+        try:
+            yield
+        finally:
+            if manual_sync_task is not None:
+                manual_sync_task.cancel()
+            tg.cancel_scope.cancel()
+    scheduler.heap.clear()
+    await repo_manager.close()
+    log.info("Background workers stopped")
+
 app = FastAPI(
     title="Enhanced XCode AI Coding Assistant", 
     version="2.0.0",
-    description="AI-powered coding assistant with collaborative DeepSeek + Gemini analysis"
+    description="AI-powered coding assistant with collaborative DeepSeek + Gemini analysis",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Configure templates
-templates = Jinja2Templates(directory="templates")
+# Static assets (index page, CSS, JS) are served straight from disk
+app.mount("/static", StaticFiles(directory="static", html=False), name="static")
+
+# Sync counters for scraping; per-tick numbers go here instead of into the log
+if prometheus_client is not None:
+    SYNC_FILES = prometheus_client.Counter("xcode_sync_files_total", "Files loaded into the AI context by syncs", ["repo"])
+    SYNC_SECONDS = prometheus_client.Histogram("xcode_sync_seconds", "Duration of periodic repository syncs")
+    app.mount("/metrics", prometheus_client.make_asgi_app())
+else:
+    SYNC_FILES = SYNC_SECONDS = None
+
+# Whitespace the browser would collapse anyway; <pre>, <textarea> and <script> bodies are left alone
+_HTML_PRESERVE_RE = re.compile(rb"(<(pre|textarea|script)\b.*?</\2>)", re.DOTALL | re.IGNORECASE)
+_HTML_LINE_BREAK_RE = re.compile(rb">\s*\n\s*<")
+_HTML_SPACE_RUN_RE = re.compile(rb"\s{2,}")
+
+def _minify_html(html: bytes) -> bytes:
+    parts = _HTML_PRESERVE_RE.split(html)
+    out = []
+    # split() yields [text, block, tag name, text, block, tag name, ...]
+    for i in range(0, len(parts), 3):
+        out.append(_HTML_SPACE_RUN_RE.sub(b" ", _HTML_LINE_BREAK_RE.sub(b"><", parts[i])))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return b"".join(out)
+
+# The index page has no per-request data: read it once, minify it and keep compressed variants
+with open(os.path.join("static", "index.html"), "rb") as index_file:
+    _INDEX_UTF8 = _minify_html(index_file.read())
+_INDEX_VARIANTS = {
+    "identity": _INDEX_UTF8,
+    "gzip": gzip.compress(_INDEX_UTF8, 9),
+}
+if brotli is not None:
+    _INDEX_VARIANTS["br"] = brotli.compress(_INDEX_UTF8, quality=11)
+_INDEX_ETAG = f'"{hashlib.sha1(_INDEX_UTF8).hexdigest()}"'
+
+# Known repository failures are client errors: surface the message as a 400
+@app.exception_handler(RepoError)
+async def repo_error_handler(request: Request, exc: RepoError):
+    return ORJSONResponse(status_code=400, content={"detail": str(exc)})
+
+# Single place for unexpected errors: log the traceback and return a canonical JSON body.
+# Registered before CORSMiddleware so it runs inside it: 500s keep their CORS headers,
+# and the error is logged once here instead of again by the server error middleware
+@app.middleware("http")
+async def unhandled_error_middleware(request: Request, call_next):
+    try:
+        return await call_next(request)
+    except Exception:
+        log.exception("❌ Unhandled error on %s %s", request.method, request.url.path)
+        return ORJSONResponse(status_code=500, content={"detail": "Internal server error"})
 
 # Enhanced CORS middleware
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # Let browsers reuse a preflight for a day
 )
 
 # Initialize services with enhanced configuration
@@ -46,261 +191,705 @@ ai_agent = AIAgentService(
     deepseek_api_key=os.getenv("DEEPSEEK_API_KEY")
 )
 
-# Enhanced job storage with better management
-job_results = {}
-job_queue = deque()
+# Enhanced job storage with better management - insertion/update ordered for O(1) eviction
+job_results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+job_expiry_heap: List[tuple] = []  # (next expiry check in monotonic seconds, job_id)
 MAX_JOBS_STORED = 50
+COMPLETED_JOB_TTL = 1800  # 30 minutes for completed jobs
+JOB_TTL = 3600  # 1 hour for everything else
+FILE_PROCESS_CONCURRENCY = int(os.getenv("AI_CTX_CONCURRENCY", "8"))  # Concurrent file reads/context updates per repository
+SYNC_CONTEXT_CONCURRENCY = int(os.getenv("SYNC_CONTEXT_CONCURRENCY", "32"))  # Shared bound when a sync updates all repositories together
+STREAM_THRESHOLD = 256 * 1024  # File content responses above this size are streamed
+USE_ASYNC_FILES = os.getenv("USE_ASYNC_FILES", "false").lower() == "true" and aiofiles is not None
+CONTEXT_FILE_MAX_BYTES = int(os.getenv("CONTEXT_FILE_MAX_BYTES", str(512 * 1024)))  # Larger files are skipped by the context sync without being read
+
+# Bounded analysis queue drained by a fixed pool of workers; sized to the job store
+# so a queued job is never evicted before a worker picks it up
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+BLOCKING_IO_THREADS = int(os.getenv("BLOCKING_IO_THREADS", "32"))  # Default executor size for asyncio.to_thread work
+job_queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_JOBS_STORED)  # Replaced at startup on the serving loop
+
+# Jobs still queued or processing, keyed by (query, is_error_analysis, use_deepseek, force_sync)
+inflight_jobs: Dict[tuple, str] = {}
+
+# One-shot events woken by update_job, keyed by job id; created only while someone is waiting
+job_update_events: Dict[str, asyncio.Event] = {}
+
+# Running estimate of memory held by stored job results, measured once per result
+job_sizes: Dict[str, int] = {}
+job_memory_bytes = 0
 RENDER_TIMEOUT = 25  # Keep under 30 second limit
+GC_GEN0_THRESHOLD = int(os.getenv("GC_GEN0_THRESHOLD", "50000"))  # Allocations between young-generation collections
+
+# Content fingerprints of files last pushed to the AI context, keyed by (repo_name, file_path)
+context_fingerprints: Dict[tuple, bytes] = {}
+CONTEXT_FINGERPRINT_LIMIT = 20000
+
+# Serialized bodies for frequently polled endpoints: key -> (monotonic timestamp, bytes)
+response_cache: Dict[str, tuple] = {}
+HEALTH_CACHE_TTL = 1.0
+STATUS_CACHE_TTL = 5.0
+REPOSITORIES_CACHE_TTL = 10.0
 
 # Background sync management
-sync_in_progress = False
-last_sync_attempt = None
+sync_lock = asyncio.Lock()  # Held for the duration of any all-repository sync
+last_sync_mono: Optional[float] = None
+manual_sync_task: Optional[asyncio.Task] = None  # Sync started from the API, kept so repeat calls coalesce
+
+async def _job_worker():
+    """Run queued analysis jobs one at a time"""
+    while True:
+        fn, args = await job_queue.get()
+        try:
+            await fn(*args)
+        except Exception as e:
+            log.error("❌ Job worker error: %s", e)
+        finally:
+            job_queue.task_done()
+
+_sync_lock_fd: Optional[int] = None
+
+def acquire_sync_leadership() -> bool:
+    """Take an exclusive lock file so only one uvicorn worker runs the periodic sync.
+    
+    The descriptor stays open for the life of the process; the OS drops the lock when it exits.
+    """
+    global _sync_lock_fd
+    if fcntl is None:
+        return True
+    # base_path is the directory GitRepoManager verified as writable (or its fallback)
+    fd = os.open(os.path.join(repo_manager.base_path, ".xcode_sync.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    _sync_lock_fd = fd
+    return True
+
+def enqueue_analysis(query: str, is_error_analysis: bool, use_deepseek: str, force_sync: bool = False) -> str:
+    """Register a queued job and hand it to the worker pool, or reject if the queue is full.
+    
+    Returns the job id. An identical request that is still queued or processing is shared
+    rather than run again, so a burst of the same build error costs one analysis.
+    """
+    key = (query, is_error_analysis, use_deepseek, force_sync)
+    job_id = inflight_jobs.get(key)
+    if job_id is not None and job_id in job_results:
+        return job_id
+    
+    if job_queue.full():
+        raise HTTPException(status_code=429, detail="Too many queued jobs, please retry shortly")
+    
+    job_id = new_job_id()
+    inflight_jobs[key] = job_id
+    put_job(job_id, {
+        'status': 'queued',
+        'created_at': datetime.now(),  # Display only; timing uses created_monotonic
+        'created_monotonic': time.monotonic(),
+        'result': None,
+        'error': None,
+        'progress': 'Waiting for an available worker...'
+    })
+    job_queue.put_nowait((process_collaborative_analysis_async, (job_id, query, is_error_analysis, use_deepseek, force_sync)))
+    return job_id
+
+async def cached_json(key: str, ttl: float, build, prefix: bytes = b"") -> Response:
+    """Serve a pre-serialized JSON body, rebuilding it in a worker thread at most once per ttl seconds.
+    
+    prefix is an already-serialized JSON object with its closing brace removed; the fields from
+    build() are appended to it so constant parts of a response are never re-encoded.
+    build may also be a coroutine function, for builders that fan work out themselves.
+    """
+    def _serialize(make) -> bytes:
+        body = orjson.dumps(make(), default=str)
+        return prefix + b"," + body[1:] if prefix else body
+    
+    now = time.monotonic()
+    entry = response_cache.get(key)
+    if entry is None or now - entry[0] >= ttl:
+        if asyncio.iscoroutinefunction(build):
+            data = await build()
+            body = await asyncio.to_thread(_serialize, lambda: data)
+        else:
+            body = await asyncio.to_thread(_serialize, build)
+        entry = (now, body)
+        response_cache[key] = entry
+    return Response(content=entry[1], media_type="application/json")
+
+def invalidate_cached(*keys: str):
+    for key in keys:
+        response_cache.pop(key, None)
+
+def _pick_encoding(accept_encoding: str) -> str:
+    """Choose the best precompressed variant the client accepts"""
+    accepted = set()
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in _INDEX_VARIANTS and encoding in accepted:
+            return encoding
+    return "identity"
 
 # Root endpoint to serve index.html
 @app.get("/", response_class=HTMLResponse)
 async def serve_index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    headers = {
+        "ETag": _INDEX_ETAG,
+        "Cache-Control": "public, max-age=3600",
+        "Vary": "Accept-Encoding"
+    }
+    if request.headers.get("if-none-match") == _INDEX_ETAG:
+        return Response(status_code=304, headers=headers)
+    
+    encoding = _pick_encoding(request.headers.get("accept-encoding", ""))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=_INDEX_VARIANTS[encoding], media_type="text/html", headers=headers)
 
 # Enhanced periodic sync task
+class PeriodicScheduler:
+    """Runs every recurring background job from a single task, ordered by a min-heap of next run times.
+    
+    run() is started in the lifespan task group, which cancels it on shutdown.
+    """
+    
+    def __init__(self):
+        self.heap: List[tuple] = []  # (next_run monotonic, registration order, interval, jitter, coro_factory)
+        self._registered = 0
+    
+    def every(self, interval: float, coro_factory, delay: Optional[float] = None, jitter: float = 0.0):
+        """Register coro_factory to run every interval (+/- jitter) seconds, first after delay (default: one interval)"""
+        first_run = time.monotonic() + (interval if delay is None else delay)
+        heapq.heappush(self.heap, (first_run, self._registered, interval, jitter, coro_factory))
+        self._registered += 1
+    
+    async def run(self):
+        while self.heap:
+            next_run, order, interval, jitter, coro_factory = heapq.heappop(self.heap)
+            await asyncio.sleep(max(0.0, next_run - time.monotonic()))
+            try:
+                await coro_factory()
+            except Exception as e:
+                log.error("❌ Scheduled job %s failed: %s", coro_factory.__name__, e)
+            next_run = time.monotonic() + interval + random.uniform(-jitter, jitter)
+            heapq.heappush(self.heap, (next_run, order, interval, jitter, coro_factory))
+
+scheduler = PeriodicScheduler()
+SYNC_INTERVAL = 300  # 5 minutes between periodic syncs
+SYNC_JITTER = 30  # Spread syncs so replicas restarted together don't fetch in lockstep
+CLEANUP_INTERVAL = 300  # 5 minutes between job cleanups
+
+# Enhanced periodic sync - one pass, run by the scheduler
 async def enhanced_periodic_sync():
-    global sync_in_progress, last_sync_attempt
+    global last_sync_mono
     
-    while True:
-        try:
-            current_time = datetime.now()
+    current_mono = time.monotonic()
+    if sync_lock.locked() or (
+        last_sync_mono is not None and
+        current_mono - last_sync_mono <= 180  # 3 minutes
+    ):
+        return
+    
+    try:
+        async with sync_lock:
+            last_sync_mono = current_mono
             
-            if not sync_in_progress and (
-                not last_sync_attempt or 
-                (current_time - last_sync_attempt).total_seconds() > 180  # 3 minutes
-            ):
-                sync_in_progress = True
-                last_sync_attempt = current_time
-                
-                print(f"🔄 Starting enhanced periodic sync at {current_time}")
-                
-                # Use batch sync with timeout handling
-                sync_results = await repo_manager.sync_all_repositories_batch(
-                    batch_size=2,  # Small batches for timeout safety
-                    max_duration=RENDER_TIMEOUT
-                )
-                
-                # Update AI agent context with priority files
-                context_update_count = 0
-                for repo_name, (success, message, file_count) in sync_results.items():
-                    if success and file_count > 0:
-                        critical_files = await process_repository_files(repo_name, priority_only=True)
-                        context_update_count += critical_files
-                        
-                        # Limit context updates to prevent timeout
-                        if context_update_count > 50:
-                            break
-                
-                print(f"✅ Enhanced sync completed: {len(sync_results)} repos, {context_update_count} files processed")
-                
-        except Exception as e:
-            print(f"❌ Enhanced sync error: {str(e)}")
-        finally:
-            sync_in_progress = False
+            log.debug("🔄 Starting enhanced periodic sync")
+            
+            # Use batch sync with timeout handling
+            sync_results = await repo_manager.sync_all_repositories_batch(
+                batch_size=2,  # Small batches for timeout safety
+                max_duration=RENDER_TIMEOUT
+            )
             
-        # Wait 5 minutes before next sync
-        await asyncio.sleep(300)
+            # Update AI agent context with priority files from every synced repo at once,
+            # sharing one concurrency bound across repositories
+            sem = asyncio.Semaphore(SYNC_CONTEXT_CONCURRENCY)
+            updated_repos = [
+                repo_name for repo_name, (success, message, file_count) in sync_results.items()
+                if success and file_count > 0
+            ]
+            counts = await asyncio.gather(*[
+                process_repository_files(repo_name, priority_only=True, sem=sem)
+                for repo_name in updated_repos
+            ], return_exceptions=True)
+            context_update_count = sum(count for count in counts if isinstance(count, int))
+            
+            if SYNC_FILES is not None:
+                for repo_name, count in zip(updated_repos, counts):
+                    if isinstance(count, int) and count:
+                        SYNC_FILES.labels(repo_name).inc(count)
+                SYNC_SECONDS.observe(time.monotonic() - current_mono)
+            
+            log.info("✅ Enhanced sync completed: %d repos, %d files processed", len(sync_results), context_update_count)
+            
+    except Exception as e:
+        log.error("❌ Enhanced sync error: %s", e)
+
+def _fingerprint_for_context(content: Optional[str]):
+    """Fingerprint file content worth adding to the context, or (None, None) to skip it"""
+    if not content or len(content) <= 10 or content.startswith("File too large"):
+        return None, None
+    return content, hashlib.blake2b(content.encode(), digest_size=16).digest()
 
-async def process_repository_files(repo_name: str, priority_only: bool = True) -> int:
-    """Process repository files with priority handling"""
+def _read_for_context(repo_name: str, file_path: str):
+    """Read a file and fingerprint it; runs in a worker thread"""
+    return _fingerprint_for_context(repo_manager.get_file_content(repo_name, file_path, CONTEXT_FILE_MAX_BYTES))
+
+async def _async_read_for_context(repo_name: str, file_path: str):
+    """aiofiles variant of _read_for_context, used when USE_ASYNC_FILES is enabled"""
+    config = repo_manager.repos_config.get(repo_name)
+    if config is None:
+        return None, None
+    max_size = min(repo_manager.get_max_file_size(file_path), CONTEXT_FILE_MAX_BYTES)
+    try:
+        async with aiofiles.open(config.local_path / file_path, 'rb') as f:
+            raw = await f.read(max_size + 1)
+    except OSError:
+        return None, None
+    if len(raw) > max_size:
+        return None, None
+    return _fingerprint_for_context(repo_manager.decode_file_content(file_path, raw))
+
+async def process_repository_files(repo_name: str, priority_only: bool = True,
+                                   sem: Optional[asyncio.Semaphore] = None) -> int:
+    """Process repository files with priority handling; pass sem to share a bound across repositories"""
     try:
-        files = repo_manager.list_files(repo_name)
-        processed_count = 0
+        # Served from the index the sync walk just built; a thread only in case the repo was never indexed
+        files = await asyncio.to_thread(repo_manager.list_files, repo_name, CODE_EXTENSIONS,
+                                        limit=30 if priority_only else 100)
+        if sem is None:
+            sem = asyncio.Semaphore(FILE_PROCESS_CONCURRENCY)
         
-        # Process files in priority order
-        for file_path in files[:30 if priority_only else 100]:  # Limit for timeout safety
-            try:
-                content = repo_manager.get_file_content(repo_name, file_path)
-                if content and len(content) > 10 and not content.startswith("File too large"):
-                    await ai_agent.update_file_context(repo_name, file_path, content)
-                    processed_count += 1
+        async def _one(file_path: str):
+            async with sem:
+                try:
+                    if USE_ASYNC_FILES:
+                        content, fingerprint = await _async_read_for_context(repo_name, file_path)
+                    else:
+                        content, fingerprint = await asyncio.to_thread(_read_for_context, repo_name, file_path)
+                    if content is None:
+                        return None
                     
-                    # Process in small batches to prevent timeout
-                    if processed_count % 10 == 0:
-                        await asyncio.sleep(0.1)  # Brief pause to prevent blocking
-                        
-            except Exception as e:
-                print(f"❌ Error processing file {file_path}: {e}")
-                continue
+                    # Skip unchanged files that are still loaded in the AI context
+                    if (context_fingerprints.get((repo_name, file_path)) == fingerprint and
+                            f"{repo_name}:{file_path}" in ai_agent.file_contexts):
+                        return None
+                    return file_path, content, fingerprint
+                    
+                except Exception as e:
+                    log.debug("❌ Error processing file %s: %s", file_path, e)
+                    return None
         
-        return processed_count
+        # Read files in priority order, bounded for timeout safety, then hand the changed ones
+        # to the agent in one batch
+        results = await asyncio.gather(
+            *[_one(file_path) for file_path in files],
+            return_exceptions=True
+        )
+        changed = [result for result in results if isinstance(result, tuple)]
+        if changed:
+            await ai_agent.update_file_contexts(repo_name, [(file_path, content) for file_path, content, _ in changed])
+            for file_path, _, fingerprint in changed:
+                context_fingerprints.pop((repo_name, file_path), None)  # Re-insert as newest
+                context_fingerprints[(repo_name, file_path)] = fingerprint
+            trim_context_fingerprints()
+        return len(changed)
         
     except Exception as e:
-        print(f"❌ Error processing repository {repo_name}: {e}")
+        log.error("❌ Error processing repository %s: %s", repo_name, e)
         return 0
 
-# Enhanced job cleanup
+def trim_context_fingerprints():
+    """Keep the fingerprint store bounded: forget files the agent evicted, then the oldest entries"""
+    if len(context_fingerprints) <= CONTEXT_FINGERPRINT_LIMIT:
+        return
+    for key in [key for key in context_fingerprints if f"{key[0]}:{key[1]}" not in ai_agent.file_contexts]:
+        del context_fingerprints[key]
+    excess = len(context_fingerprints) - CONTEXT_FINGERPRINT_LIMIT
+    for key in list(itertools.islice(context_fingerprints, max(excess, 0))):
+        del context_fingerprints[key]
+
+def estimate_size(obj: Any) -> int:
+    """Approximate deep size of a JSON-like object using sys.getsizeof"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+def track_job_size(job_id: str, result: Any):
+    """Record the size of a job's result in the running memory estimate"""
+    global job_memory_bytes
+    size = estimate_size(result) + sys.getsizeof(job_id)
+    job_memory_bytes += size - job_sizes.get(job_id, 0)
+    job_sizes[job_id] = size
+
+def forget_job_size(job_id: str):
+    """Remove a dropped job from the running memory estimate"""
+    global job_memory_bytes
+    job_memory_bytes -= job_sizes.pop(job_id, 0)
+
+def update_job(job_id: str, **fields):
+    """Apply fields to a stored job and wake anyone waiting on it; a no-op once the job expired"""
+    job_data = job_results.get(job_id)
+    if job_data is None:
+        return
+    job_data.update(fields)
+    release_job_waiters(job_id)
+
+def job_update_event(job_id: str) -> asyncio.Event:
+    """Event set on the next update to job_id. Take it before reading the job so no update slips between"""
+    event = job_update_events.get(job_id)
+    if event is None:
+        event = job_update_events[job_id] = asyncio.Event()
+    return event
+
+def release_job_waiters(job_id: str):
+    event = job_update_events.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+def new_job_id() -> str:
+    """Random URL-safe job id; ids are the only handle on a job's result, so they stay unguessable"""
+    return secrets.token_urlsafe(12)
+
+def put_job(job_id: str, job_data: Dict[str, Any]):
+    """Store a new job and index it for expiry"""
+    job_results[job_id] = job_data
+    job_results.move_to_end(job_id)
+    created = job_data['created_monotonic']
+    heapq.heappush(job_expiry_heap, (created + COMPLETED_JOB_TTL, job_id))
+
+def expire_jobs(now: float) -> int:
+    """Pop due entries off the expiry heap, stopping at the first one still in the future"""
+    removed = 0
+    
+    while job_expiry_heap and job_expiry_heap[0][0] <= now:
+        _, job_id = heapq.heappop(job_expiry_heap)
+        job_data = job_results.get(job_id)
+        if job_data is None:
+            continue  # Already evicted
+        
+        # Remove completed jobs older than 30 minutes, anything else after an hour
+        created = job_data['created_monotonic']
+        if job_data.get('status') == 'completed' or now - created >= JOB_TTL:
+            del job_results[job_id]
+            forget_job_size(job_id)
+            release_job_waiters(job_id)
+            removed += 1
+        else:
+            heapq.heappush(job_expiry_heap, (created + JOB_TTL, job_id))
+    
+    # Ensure we don't exceed storage limits - oldest first
+    while len(job_results) > MAX_JOBS_STORED:
+        job_id, _ = job_results.popitem(last=False)
+        forget_job_size(job_id)
+        release_job_waiters(job_id)
+        removed += 1
+    
+    return removed
+
+# Enhanced job cleanup - one pass, run by the scheduler
 async def enhanced_job_cleanup():
     """Enhanced job cleanup with better memory management"""
-    while True:
-        await asyncio.sleep(300)  # Clean up every 5 minutes
-        try:
-            current_time = datetime.now()
-            jobs_to_remove = []
+    try:
+        removed = expire_jobs(time.monotonic())
             
-            for job_id, job_data in job_results.items():
-                # Remove completed jobs older than 30 minutes
-                time_threshold = 1800 if job_data.get('status') == 'completed' else 3600
-                
-                if (current_time - job_data['created_at']).total_seconds() > time_threshold:
-                    jobs_to_remove.append(job_id)
+        if removed:
+            log.info("🗑️ Cleaned up %d old jobs", removed)
             
-            for job_id in jobs_to_remove:
-                job_results.pop(job_id, None)
-                
-            # Ensure we don't exceed storage limits
-            while len(job_results) > MAX_JOBS_STORED:
-                oldest_job_id = min(job_results.keys(), 
-                                  key=lambda k: job_results[k]['created_at'])
-                job_results.pop(oldest_job_id, None)
-                
-            if jobs_to_remove:
-                print(f"🗑️ Cleaned up {len(jobs_to_remove)} old jobs")
-                
-            # Clean up AI agent context periodically
-            await ai_agent.refresh_context_if_needed()
-                
-        except Exception as e:
-            print(f"❌ Job cleanup error: {str(e)}")
+        # Clean up AI agent context periodically
+        await ai_agent.refresh_context_if_needed()
+            
+    except Exception as e:
+        log.error("❌ Job cleanup error: %s", e)
+
+# Bounded field types - oversized or malformed bodies are rejected by the validator
+# before they reach the job queue or the AI backends
+RepoName = Annotated[str, StringConstraints(min_length=1, max_length=100, pattern=REPO_NAME_PATTERN)]
+PromptText = Annotated[str, StringConstraints(min_length=1, max_length=32768)]
+ModelChoice = Annotated[str, StringConstraints(max_length=32)]
 
 # Enhanced Pydantic models
 class RepoConfig(BaseModel):
-    name: str
-    url: str
-    branch: str = "main"
-    access_token: Optional[str] = None
-    sync_interval: int = 300
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True, regex_engine='python-re')  # Name pattern uses a lookahead
+    
+    name: RepoName
+    url: Annotated[str, StringConstraints(min_length=1, max_length=2048)]
+    branch: Annotated[str, StringConstraints(min_length=1, max_length=255)] = "main"
+    access_token: Optional[Annotated[str, StringConstraints(max_length=512)]] = None
+    sync_interval: Annotated[int, Field(ge=60, le=86400)] = 300
 
 class XCodeErrorRequest(BaseModel):
-    error_message: str
-    use_deepseek: str  # Changed to str to handle "both"
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True)
+    
+    error_message: PromptText
+    use_deepseek: ModelChoice  # Changed to str to handle "both"
+    force_sync: bool = False
+    stream: bool = False  # Respond with server-sent job updates instead of a job id
 
 class GeneralQueryRequest(BaseModel):
-    query: str
-    use_deepseek: str  # Changed to str to handle "both"
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True)
+    
+    query: PromptText
+    use_deepseek: ModelChoice  # Changed to str to handle "both"
+    force_sync: bool = False
+    stream: bool = False  # Respond with server-sent job updates instead of a job id
+
+class AddRepositoryResponse(BaseModel):
+    success: bool
+    message: str
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str
+    status: str
+    message: str
+    estimated_completion: str
 
 # Enhanced endpoint for adding repository
-@app.post("/api/repositories/add")
+@app.post("/api/repositories/add", response_model=AddRepositoryResponse)
 async def add_repository(request: RepoConfig, background_tasks: BackgroundTasks):
-    try:
-        repo_manager.add_repository(
-            name=request.name,
-            url=request.url,
-            branch=request.branch,
-            access_token=request.access_token,
-            sync_interval=request.sync_interval
-        )
-        background_tasks.add_task(repo_manager.clone_or_update_repo_with_timeout, request.name)
-        return {
-            "success": True,
-            "message": f"Repository {request.name} added and sync started"
-        }
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        print(f"❌ Error adding repository: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+    repo_manager.add_repository(
+        name=request.name,
+        url=request.url,
+        branch=request.branch,
+        access_token=request.access_token,
+        sync_interval=request.sync_interval
+    )
+    background_tasks.add_task(clone_and_ingest, request.name)
+    invalidate_cached("repositories", "health", "status_full")
+    return AddRepositoryResponse(success=True, message=f"Repository {request.name} added and sync started")
 
 # Enhanced endpoint for syncing all repositories
 @app.post("/api/repositories/sync")
-async def sync_all_repositories(background_tasks: BackgroundTasks):
+async def sync_all_repositories():
+    global manual_sync_task
     repos = repo_manager.get_repositories()
     if not repos:
         raise HTTPException(status_code=404, detail="No repositories configured")
 
-    for repo_name in repos:
-        background_tasks.add_task(repo_manager.clone_or_update_repo_with_timeout, repo_name)
+    # Coalesce with a sync that is already running or about to start
+    if sync_lock.locked() or (manual_sync_task is not None and not manual_sync_task.done()):
+        return {
+            "success": True,
+            "status": "already_running",
+            "message": "A sync is already in progress",
+            "repositories_count": len(repos)
+        }
+    
+    manual_sync_task = asyncio.create_task(sync_repositories_locked(repos))
+    invalidate_cached("repositories")
     
     return {
         "success": True,
+        "status": "started",
         "message": "Sync started for all repositories",
         "repositories_count": len(repos)
     }
 
+async def clone_and_ingest(repo_name: str):
+    """Clone a newly added repository, then load its priority files into the AI context concurrently"""
+    success, message, file_count = await repo_manager.clone_or_update_repo_with_timeout(repo_name)
+    if not success or file_count == 0:
+        return
+    count = await process_repository_files(repo_name, priority_only=True,
+                                           sem=asyncio.Semaphore(SYNC_CONTEXT_CONCURRENCY))
+    log.info("✅ Loaded %d files from %s into context", count, repo_name)
+
+async def sync_repositories_locked(repos: Tuple[str, ...]):
+    """Sync the given repositories under sync_lock; a no-op if another sync got there first"""
+    if sync_lock.locked():
+        return
+    async with sync_lock:
+        for repo_name in repos:
+            await repo_manager.clone_or_update_repo_with_timeout(repo_name)
+
 # Enhanced endpoint for getting repositories
 @app.get("/api/repositories")
 async def get_repositories():
+    return await cached_json("repositories", REPOSITORIES_CACHE_TTL, _build_repositories)
+
+async def _build_repositories() -> Dict[str, Any]:
+    # Structures may need a directory walk; run them side by side in the thread pool
+    configs = tuple(repo_manager.repos_config.items())
+    structures = await asyncio.gather(*[
+        asyncio.to_thread(repo_manager.get_repository_structure, name) for name, _ in configs
+    ])
+    get_progress = repo_manager.get_sync_progress
     return {
-        "repositories": list(repo_manager.repos_config.keys()),
-        "sync_progress": {name: repo_manager.get_sync_progress(name) for name in repo_manager.repos_config}
+        "repositories": [
+            {
+                "name": name,
+                "url": config.url,
+                "branch": config.branch,
+                "sync_interval": config.sync_interval,
+                "last_sync": structure["last_sync"],
+                "total_files": structure["total_files"],
+                "critical_files": structure["critical_files"],
+                "status": structure["status"]
+            }
+            for (name, config), structure in zip(configs, structures)
+        ],
+        "sync_progress": {name: get_progress(name) for name, _ in configs}
     }
 
 # Enhanced endpoint for getting repository structure
 @app.get("/api/repositories/{repo_name}")
 async def get_repository(repo_name: str):
-    structure = repo_manager.get_repository_structure(repo_name)
+    structure = await asyncio.to_thread(repo_manager.get_repository_structure, repo_name)
     if not structure:
         raise HTTPException(status_code=404, detail="Repository not found")
     return structure
 
+# File listing with sizes and short previews
+@app.get("/api/repositories/{repo_name}/files")
+async def get_enhanced_repository_files(repo_name: str):
+    if repo_name not in repo_manager.repos_config:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    
+    def _describe(file_path: str) -> Dict[str, Any]:
+        stat = repo_manager.get_file_stat(repo_name, file_path)
+        size, head = stat if stat else (0, None)
+        extension, file_type = repo_manager.classify_file(file_path)
+        return {
+            "path": file_path,
+            "extension": extension,
+            "type": file_type,
+            "size": size,
+            "binary": stat is not None and head is None,
+            "preview": head[:200] if head else ""
+        }
+    
+    def _describe_all(files: List[str]) -> Dict[str, Any]:
+        # One pass builds the details and the per-type summary together
+        details = []
+        extensions = set()
+        type_counts = {"critical": 0, "important": 0, "other": 0}
+        for file_path in files:
+            detail = _describe(file_path)
+            details.append(detail)
+            extensions.add(detail["extension"])
+            type_counts[detail["type"]] += 1
+        return {
+            "files": details,
+            "file_types": sorted(extensions),
+            "critical_files": type_counts["critical"],
+            "important_files": type_counts["important"]
+        }
+    
+    # The sync-built index gives the listing and total without a walk; only returned files are read
+    index = await asyncio.to_thread(repo_manager.get_file_index, repo_name)
+    summary = await asyncio.to_thread(_describe_all, index["files"][:100])
+    return {
+        "repository": repo_name,
+        "total_files": len(index["files"]),
+        **summary
+    }
+
+def check_file_request(repo_name: str, path: str):
+    """Reject unknown repositories and escaping paths before touching the filesystem"""
+    if repo_name not in repo_manager.repos_config:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    if not path or path.startswith(("/", "\\")) or ".." in path.replace("\\", "/").split("/"):
+        raise HTTPException(status_code=400, detail="Invalid file path")
+
 # Enhanced endpoint for getting file content
 @app.get("/api/repositories/{repo_name}/files/{path:path}")
 async def get_file_content(repo_name: str, path: str):
-    content = repo_manager.get_file_content(repo_name, path)
+    check_file_request(repo_name, path)
+    full_path = await asyncio.to_thread(repo_manager.resolve_file_path, repo_name, path)
+    if not full_path:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # The per-type size limit applies whichever way the file is sent
+    size = (await asyncio.to_thread(full_path.stat)).st_size
+    max_size = repo_manager.get_max_file_size(path)
+    if size > max_size:
+        raise HTTPException(status_code=413, detail=f"File too large ({size} bytes, max {max_size})")
+    
+    # Large files go out as a chunked text/plain stream instead of one JSON string
+    if size > STREAM_THRESHOLD:
+        return StreamingResponse(repo_manager.iter_file_content(repo_name, path), media_type="text/plain")
+    
+    content = await asyncio.to_thread(repo_manager.get_file_content, repo_name, path)
     if not content:
         raise HTTPException(status_code=404, detail="File not found")
     return {"content": content}
 
+# Raw file endpoint - serves bytes straight from disk without decoding into JSON
+@app.get("/api/repositories/{repo_name}/raw/{path:path}")
+async def get_raw_file(repo_name: str, path: str):
+    check_file_request(repo_name, path)
+    full_path = await asyncio.to_thread(repo_manager.resolve_file_path, repo_name, path)
+    if not full_path:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(full_path)
+
 # Enhanced endpoint for analyzing Xcode error
-@app.post("/api/xcode/analyze-error")
+@app.post("/api/xcode/analyze-error", response_model=JobAcceptedResponse)
 async def enhanced_analyze_xcode_error(request: XCodeErrorRequest):
-    try:
-        job_id = str(uuid.uuid4())
-        
-        # Queue the collaborative analysis
-        asyncio.create_task(process_collaborative_analysis_async(
-            job_id, "", True, request.error_message, request.use_deepseek
-        ))
-        
-        return {
-            "job_id": job_id,
-            "status": "queued",
-            "message": "Enhanced XCode error analysis started",
-            "estimated_completion": "30-60 seconds"
-        }
-        
-    except Exception as e:
-        print(f"❌ Error queuing XCode analysis: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Queue the collaborative analysis, or join an identical one that is still in flight
+    job_id = enqueue_analysis(request.error_message, True, request.use_deepseek, request.force_sync)
+    if request.stream:
+        return StreamingResponse(job_event_stream(job_id), media_type="text/event-stream")
+    
+    return JobAcceptedResponse(
+        job_id=job_id,
+        status="queued",
+        message="Enhanced XCode error analysis started",
+        estimated_completion="30-60 seconds"
+    )
 
 # Enhanced endpoint for general query
-@app.post("/api/query")
+@app.post("/api/query", response_model=JobAcceptedResponse)
 async def enhanced_general_query(request: GeneralQueryRequest):
-    try:
-        job_id = str(uuid.uuid4())
-        
-        # Queue the collaborative analysis
-        asyncio.create_task(process_collaborative_analysis_async(
-            job_id, request.query, False, request.use_deepseek
-        ))
-        
-        return {
-            "job_id": job_id,
-            "status": "queued",
-            "message": "Enhanced query processing started",
-            "estimated_completion": "30-60 seconds"
-        }
-        
-    except Exception as e:
-        print(f"❌ Error queuing general query: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Queue the collaborative analysis, or join an identical one that is still in flight
+    job_id = enqueue_analysis(request.query, False, request.use_deepseek, request.force_sync)
+    if request.stream:
+        return StreamingResponse(job_event_stream(job_id), media_type="text/event-stream")
+    
+    return JobAcceptedResponse(
+        job_id=job_id,
+        status="queued",
+        message="Enhanced query processing started",
+        estimated_completion="30-60 seconds"
+    )
 
 # Enhanced job status endpoint
+JOB_FINAL_STATUSES = ("completed", "failed", "not_found")
+JOB_LONG_POLL_MAX = 25  # Upper bound on ?wait=, kept under common proxy idle timeouts
+
 @app.get("/api/job/{job_id}")
-async def get_enhanced_job_status(job_id: str):
+async def get_enhanced_job_status(job_id: str, wait: Annotated[float, Query(ge=0, le=JOB_LONG_POLL_MAX, allow_inf_nan=False)] = 0):
+    """Job status; with ?wait=N the request is held up to N seconds until the job finishes"""
+    deadline = time.monotonic() + wait
+    while True:
+        payload = job_status_payload(job_id)
+        remaining = deadline - time.monotonic()
+        if payload["status"] in JOB_FINAL_STATUSES or remaining <= 0:
+            return payload
+        event = job_update_event(job_id)  # Taken right after the snapshot so no update slips between
+        try:
+            await asyncio.wait_for(event.wait(), timeout=remaining)
+        except asyncio.TimeoutError:
+            pass
+
+def job_status_payload(job_id: str) -> Dict[str, Any]:
     if job_id not in job_results:
         return {"status": "not_found"}
     
     job_data = job_results[job_id]
+    job_results.move_to_end(job_id)  # Polled jobs are the last to be evicted under pressure
     
     # Add progress information
     if job_data.get('status') == 'processing':
         # Calculate estimated progress based on time elapsed
-        elapsed = (datetime.now() - job_data['created_at']).total_seconds()
+        elapsed = time.monotonic() - job_data['created_monotonic']
         estimated_progress = min(90, int(elapsed / 60 * 100))  # Estimate based on 60s completion time
         
         return {
@@ -310,24 +899,78 @@ async def get_enhanced_job_status(job_id: str):
             "elapsed_seconds": int(elapsed)
         }
     
-    return job_data
+    # created_monotonic is a process-local clock reading, only meaningful for expiry
+    return {key: value for key, value in job_data.items() if key != 'created_monotonic'}
+
+JOB_STREAM_HEARTBEAT = 15  # Seconds between repeated snapshots while a streamed job is quiet
+
+async def job_updates(job_id: str):
+    """Yield a status snapshot now and on every update until the job finishes, re-sending on quiet intervals"""
+    while True:
+        payload = job_status_payload(job_id)
+        finished = payload["status"] in JOB_FINAL_STATUSES
+        # Taken in the same step as the snapshot, so updates made while it is delivered are not missed
+        event = None if finished else job_update_event(job_id)
+        yield payload
+        if finished:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout=JOB_STREAM_HEARTBEAT)
+        except asyncio.TimeoutError:
+            pass  # Resend so elapsed time advances and proxies keep the connection open
+
+async def job_event_stream(job_id: str):
+    """Server-sent events for one job"""
+    async for payload in job_updates(job_id):
+        yield b"event: job\ndata: " + orjson.dumps({"job_id": job_id, **payload}, default=str) + b"\n\n"
+
+@app.websocket("/ws/job/{job_id}")
+async def job_websocket(websocket: WebSocket, job_id: str):
+    """Push job snapshots over a WebSocket, closing once the job finishes"""
+    await websocket.accept()
+    try:
+        async for payload in job_updates(job_id):
+            await websocket.send_text(orjson.dumps({"job_id": job_id, **payload}, default=str).decode())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@app.post("/api/context/clear")
+async def clear_context():
+    # Swap the context out on the loop, then free the old entries in a worker thread
+    old_contexts = ai_agent.clear_context()
+    cleared = len(old_contexts)
+    context_fingerprints.clear()
+    invalidate_cached("health", "status_full")
+    asyncio.get_running_loop().run_in_executor(None, old_contexts.clear)
+    return {"success": True, "cleared_files": cleared}
+
+# Agent summary reused until the context changes, tracked by ai_agent.ctx_version
+_context_summary_cache: Dict[str, Any] = {"version": -1, "data": None}
+
+def cached_context_summary() -> Dict[str, Any]:
+    version = ai_agent.ctx_version
+    if _context_summary_cache["version"] != version:
+        _context_summary_cache["data"] = ai_agent.get_context_summary()
+        _context_summary_cache["version"] = version
+    return _context_summary_cache["data"]
 
 @app.get("/api/context/summary")
 async def get_enhanced_context_summary():
     try:
-        summary = ai_agent.get_context_summary()
+        summary = cached_context_summary()
         
         # Add repository information
-        repo_summary = repo_manager.get_sync_statistics()
+        repo_summary = await asyncio.to_thread(repo_manager.get_sync_statistics)
         
         return {
             **summary,
             "repositories": repo_summary,
             "system_health": {
-                "sync_in_progress": sync_in_progress,
+                "sync_in_progress": sync_lock.locked(),
                 "active_jobs": len(job_results),
-                "memory_usage": len(str(job_results)) / 1024,  # Rough estimate in KB
-                "last_cleanup": datetime.now().isoformat()
+                "memory_usage": job_memory_bytes / 1024,  # Rough estimate in KB
+                "last_cleanup": datetime.now()
             }
         }
     except Exception as e:
@@ -338,47 +981,95 @@ async def get_enhanced_context_summary():
             "system_health": {"status": "error"}
         }
 
+# Lightweight health endpoint polled by the dashboard
+@app.get("/api/health")
+async def enhanced_health_check():
+    return await cached_json("health", HEALTH_CACHE_TTL, _build_health)
+
+def _build_health() -> Dict[str, Any]:
+    stats = repo_manager.get_sync_statistics()
+    return {
+        "status": "healthy",
+        "repositories": stats["total_repos"],
+        "total_files": stats["total_files"],
+        "critical_files": stats["critical_files"],
+        "context_files": len(ai_agent.file_contexts),
+        "last_sync": stats["last_successful_sync"],
+        "sync_in_progress": sync_lock.locked(),
+        "timestamp": datetime.now()
+    }
+
+# Everything the dashboard status bar shows, in one round trip
+@app.get("/api/status/full")
+async def full_status():
+    return await cached_json("status_full", HEALTH_CACHE_TTL, _build_full_status)
+
+def _build_full_status() -> Dict[str, Any]:
+    return {
+        **_build_health(),
+        "active_jobs": len(job_results),
+        "last_update": ai_agent.last_context_refresh
+    }
+
 # Enhanced status endpoint
+# Constant part of /api/status, serialized once at import and spliced into each response
+_STATUS_STATIC = orjson.dumps({
+    "message": "Enhanced XCode AI Coding Assistant API",
+    "version": "2.0.0",
+    "status": "running",
+    "features": [
+        "Collaborative AI Analysis (DeepSeek + Gemini)",
+        "Timeout-Aware Repository Syncing",
+        "Priority-Based File Processing",
+        "Enhanced Error Analysis",
+        "Real-time Progress Tracking",
+        "Intelligent Context Management"
+    ]
+})[:-1]
+_STARTED_MONOTONIC = time.monotonic()
+
 @app.get("/api/status")
 async def enhanced_status():
+    return await cached_json("status", STATUS_CACHE_TTL, _build_status, prefix=_STATUS_STATIC)
+
+def _build_status() -> Dict[str, Any]:
     return {
-        "message": "Enhanced XCode AI Coding Assistant API",
-        "version": "2.0.0",
-        "status": "running",
-        "features": [
-            "Collaborative AI Analysis (DeepSeek + Gemini)",
-            "Timeout-Aware Repository Syncing",
-            "Priority-Based File Processing",
-            "Enhanced Error Analysis",
-            "Real-time Progress Tracking",
-            "Intelligent Context Management"
-        ],
-        "timestamp": datetime.now().isoformat(),
-        "uptime_seconds": int((datetime.now() - datetime.now().replace(microsecond=0)).total_seconds()),
+        "timestamp": datetime.now(),
+        "uptime_seconds": int(time.monotonic() - _STARTED_MONOTONIC),
         "system_status": {
             "repos_configured": len(repo_manager.repos_config),
             "context_files": len(ai_agent.file_contexts),
             "active_jobs": len(job_results),
-            "sync_in_progress": sync_in_progress
+            "sync_in_progress": sync_lock.locked()
         }
     }
 
-async def process_collaborative_analysis_async(job_id: str, query: str, is_error_analysis: bool, use_deepseek: str):
+async def process_collaborative_analysis_async(job_id: str, query: str, is_error_analysis: bool, use_deepseek: str,
+                                               force_sync: bool = False):
     """Enhanced collaborative analysis processing"""
+    key = (query, is_error_analysis, use_deepseek, force_sync)
+    if job_id not in job_results:
+        if inflight_jobs.get(key) == job_id:
+            del inflight_jobs[key]
+        return  # Expired while queued; nobody can collect the result
+    
     try:
-        print(f"🔍 Processing collaborative job {job_id}")
-        job_results[job_id] = {
-            'status': 'processing',
-            'created_at': datetime.now(),
-            'result': None,
-            'error': None,
-            'progress': 'Initializing analysis...'
-        }
+        log.info("🔍 Processing collaborative job %s", job_id)
+        update_job(job_id, status='processing', progress='Initializing analysis...')
         
-        # Handle force sync if it's error analysis
-        if is_error_analysis and force_sync:
-            job_results[job_id]['progress'] = 'Syncing repositories...'
-            await repo_manager.sync_all_repositories_batch()
+        if force_sync:
+            update_job(job_id, progress='Syncing repositories...')
+            sync_results = await repo_manager.sync_all_repositories_batch()
+            # Reload every repository whose sync did not fail, not only the due ones: the context may
+            # have been cleared since, and unchanged files are skipped by their fingerprints
+            failed = {repo_name for repo_name, (success, _, _) in sync_results.items() if not success}
+            sem = asyncio.Semaphore(SYNC_CONTEXT_CONCURRENCY)
+            await asyncio.gather(*[
+                process_repository_files(repo_name, priority_only=True, sem=sem)
+                for repo_name in repo_manager.get_repositories()
+                if repo_name not in failed
+            ], return_exceptions=True)
+            update_job(job_id, progress='Analyzing...')
         
         # Perform the analysis
         if is_error_analysis:
@@ -386,18 +1077,34 @@ async def process_collaborative_analysis_async(job_id: str, query: str, is_error
         else:
             result = await ai_agent.general_coding_query(query, use_deepseek)
         
-        job_results[job_id]['status'] = 'completed'
-        job_results[job_id]['result'] = result
-        job_results[job_id]['completed_at'] = datetime.now()
-        print(f"✅ Collaborative job {job_id} completed")
+        if job_id in job_results:
+            track_job_size(job_id, result)
+            job_results.move_to_end(job_id)
+        update_job(job_id, status='completed', result=result, completed_at=datetime.now())
+        log.info("✅ Collaborative job %s completed", job_id)
         
     except Exception as e:
-        print(f"❌ Collaborative job {job_id} failed: {e}")
-        job_results[job_id]['status'] = 'failed'
-        job_results[job_id]['error'] = str(e)
-        job_results[job_id]['failed_at'] = datetime.now()
+        log.error("❌ Collaborative job %s failed: %s", job_id, e)
+        if job_id in job_results:
+            track_job_size(job_id, str(e))
+            job_results.move_to_end(job_id)
+        update_job(job_id, status='failed', error=str(e), failed_at=datetime.now())
+    
+    finally:
+        # Later identical requests start a fresh job once this one has a result
+        if inflight_jobs.get(key) == job_id:
+            del inflight_jobs[key]
 
 if __name__ == "__main__":
     import uvicorn
-    print("🚀 Starting Enhanced XCode AI Coding Assistant...")
-    uvicorn.run(app, host="0.0.0.0", port=10000, log_level="info")
\ No newline at end of file
+    log.info("🚀 Starting Enhanced XCode AI Coding Assistant...")
+    # Job results live in process memory, so extra workers only suit deployments with sticky routing
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run(
+        "main:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=10000,
+        log_level="info",
+        loop="uvloop" if uvloop is not None else "asyncio",
+        workers=workers
+    )
\ No newline at end of file
@@ -3,7 +3,16 @@ const API_BASE = window.location.origin;
 let repositories = [];
 let currentResponse = null;
 let currentJobId = null;
-let statusUpdateInterval = null;
+let jobSocket = null; // WebSocket following currentJobId, closed when a newer job starts
+let statusUpdateTimer = null;
+// Raw strings behind the rendered panels, so copying never walks the DOM
+const rawText = new Map();
+const STATUS_POLL_INTERVAL = 15000; // Every 15 seconds
+const JOB_WAIT_SECONDS = 25; // Server-side hold per job status request
+const JOB_RETRY_DELAY = 2000; // Back off after a failed job status request
+
+// Response tokenizer - fenced code, **bold** and *italic* in one pattern, compiled once at module scope
+const FORMAT_RE = /```([\w+#.-]+)?\n([\s\S]*?)\n```|\*\*(.+?)\*\*|\*(.+?)\*/g;
 
 // Enhanced initialization
 async function init() {
@@ -13,8 +22,13 @@ async function init() {
     await checkServerStatus();
     await loadRepositories();
 
-    // Set up real-time status updates
-    statusUpdateInterval = setInterval(updateStatus, 15000); // Every 15 seconds
+    // Set up real-time status updates, paused while the tab is hidden
+    scheduleStatusUpdate();
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'visible') {
+            updateStatus();
+        }
+    });
 
     showNotification('🚀 XCode AI Assistant Ready!', 'success');
 }
@@ -22,7 +36,7 @@ async function init() {
 // Enhanced server status checking
 async function checkServerStatus() {
     try {
-        const response = await fetch(`${API_BASE}/api/health`);
+        const response = await fetch(`${API_BASE}/api/status/full`);
         if (response.ok) {
             const data = await response.json();
             updateStatusDisplay(data);
@@ -36,6 +50,20 @@ async function checkServerStatus() {
     }
 }
 
+async function updateStatus() {
+    await checkServerStatus();
+}
+
+// Chain timeouts instead of setInterval so a slow response can't stack up polls
+function scheduleStatusUpdate() {
+    statusUpdateTimer = setTimeout(async () => {
+        if (document.visibilityState === 'visible') {
+            await updateStatus();
+        }
+        scheduleStatusUpdate();
+    }, STATUS_POLL_INTERVAL);
+}
+
 function updateStatusDisplay(data) {
     document.getElementById('serverStatus').textContent = 'Connected ✅';
     document.getElementById('statusDot').classList.add('connected');
@@ -111,6 +139,14 @@ function updateRepositoryStats() {
     `;
 }
 
+// FastAPI errors carry `detail`: a string, or a list of validation errors with `msg`
+function errorMessage(result) {
+    const detail = result.detail;
+    if (typeof detail === 'string') return detail;
+    if (Array.isArray(detail) && detail.length) return detail[0].msg;
+    return result.message;
+}
+
 // Enhanced repository addition
 async function addRepository() {
     const name = document.getElementById('repoName').value.trim();
@@ -146,7 +182,7 @@ async function addRepository() {
             document.getElementById('accessToken').value = '';
             await loadRepositories();
         } else {
-            showNotification(result.message, 'error');
+            showNotification(errorMessage(result) || 'Failed to add repository', 'error');
         }
     } catch (error) {
         console.error('❌ Error adding repository:', error);
@@ -172,9 +208,15 @@ async function syncRepositories() {
 async function clearContext() {
     try {
         showNotification('🗑️ Clearing context...', 'info');
-        // Add API call to clear context if needed
-        await loadRepositories();
-        showNotification('Context cleared successfully', 'success');
+        const response = await fetch(`${API_BASE}/api/context/clear`, {
+            method: 'POST'
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const result = await response.json();
+        await checkServerStatus();
+        showNotification(`Context cleared (${result.cleared_files} files)`, 'success');
     } catch (error) {
         console.error('❌ Error clearing context:', error);
         showNotification('Failed to clear context', 'error');
@@ -241,92 +283,212 @@ async function submitQuery() {
     }
 }
 
-async function trackJobProgress() {
+// Show a job status update; returns true once the job is finished
+function handleJobStatus(status) {
+    if (status.status === 'completed') {
+        currentResponse = status.result;
+        displayResponse(currentResponse);
+        showNotification('✅ Analysis completed!', 'success');
+    } else if (status.status === 'failed') {
+        showNotification('❌ Analysis failed', 'error');
+    } else if (status.status === 'not_found') {
+        showNotification('❌ Job expired or not found', 'error');
+    } else {
+        return false;
+    }
+    return true;
+}
+
+function trackJobProgress() {
     if (!currentJobId) return;
-    const checkProgress = async () => {
-        try {
-            const response = await fetch(`${API_BASE}/api/job/${currentJobId}`);
-            const status = await response.json();
-
-            if (status.status === 'completed') {
-                currentResponse = status.result;
-                displayResponse(currentResponse);
-                showNotification('✅ Analysis completed!', 'success');
-            } else if (status.status === 'failed') {
-                showNotification('❌ Analysis failed', 'error');
-            } else {
-                // Still processing, check again in 2 seconds
-                setTimeout(checkProgress, 2000);
-            }
-        } catch (error) {
-            console.error('❌ Error checking job progress:', error);
-            setTimeout(checkProgress, 2000);
-        }
+    const jobId = currentJobId;
+    if (jobSocket) {
+        jobSocket.close();
+        jobSocket = null;
+    }
+    if (!('WebSocket' in window)) {
+        pollJobStatus(jobId);
+        return;
+    }
+
+    // The server pushes a snapshot on every update; if the socket drops early
+    // (e.g. a proxy without WebSocket support), carry on with long polling
+    const socket = new WebSocket(`${API_BASE.replace(/^http/, 'ws')}/ws/job/${jobId}`);
+    jobSocket = socket;
+    let finished = false;
+    socket.onmessage = (event) => {
+        if (jobId !== currentJobId) return; // A newer job owns the panels now
+        finished = handleJobStatus(JSON.parse(event.data));
+        if (finished) socket.close();
+    };
+    socket.onclose = () => {
+        if (jobSocket === socket) jobSocket = null;
+        if (!finished && jobId === currentJobId) pollJobStatus(jobId);
     };
-    await checkProgress();
 }
 
-function displayResponse(response) {
-    if (response.collaborative_analysis) {
-        document.getElementById('collaborativeResponse').textContent = response.collaborative_analysis;
+async function pollJobStatus(jobId) {
+    // Long poll: the server holds each request until the job finishes (or JOB_WAIT_SECONDS pass),
+    // and the next request goes out as soon as the previous one returns
+    if (jobId !== currentJobId) return;
+    try {
+        const response = await fetch(`${API_BASE}/api/job/${jobId}?wait=${JOB_WAIT_SECONDS}`);
+        const status = await response.json();
+        if (jobId !== currentJobId) return; // A newer job started while this request was held
+        if (!handleJobStatus(status)) {
+            pollJobStatus(jobId);
+        }
+    } catch (error) {
+        console.error('❌ Error checking job progress:', error);
+        setTimeout(() => pollJobStatus(jobId), JOB_RETRY_DELAY);
     }
+}
 
-    if (response.deepseek_analysis) {
-        // Display individual model analyses
-        const modelComparison = document.getElementById('modelComparison');
-        modelComparison.innerHTML = `
-            <details>
-                <summary>⚡ DeepSeek Analysis</summary>
-                <div class="model-content">${response.deepseek_analysis}</div>
-            </details>
-            <details>
-                <summary>🧠 Gemini Analysis</summary>
-                <div class="model-content">${response.gemini_analysis || 'No Gemini analysis available'}</div>
-            </details>
-        `;
+function displayResponse(response) {
+    rawText.clear();
+
+    // Parse each analysis once; the model panes and the code tab all render from these segments
+    const deepseekParsed = response.deepseek_analysis ? parseResponse(response.deepseek_analysis) : null;
+    const geminiParsed = response.gemini_analysis ? parseResponse(response.gemini_analysis) : null;
+
+    // Build everything off-document first, then apply all writes in one frame so the page lays out once
+    let modelPanes = null;
+    if (deepseekParsed) {
+        modelPanes = [
+            buildModelPane('⚡ DeepSeek Analysis', deepseekParsed),
+            buildModelPane('🧠 Gemini Analysis', geminiParsed || 'No Gemini analysis available')
+        ];
+    } else if (geminiParsed) {
+        modelPanes = [buildModelPane('🧠 Gemini Analysis', geminiParsed)];
     }
 
-    if (response.gemini_analysis && !response.deepseek_analysis) {
-        const modelComparison = document.getElementById('modelComparison');
-        modelComparison.innerHTML = `
-            <details>
-                <summary>🧠 Gemini Analysis</summary>
-                <div class="model-content">${response.gemini_analysis}</div>
-            </details>
-        `;
-    }
+    const codeSections = response.code_sections || codeSectionsFromSegments(deepseekParsed, geminiParsed);
+    const codeFiles = Object.keys(codeSections).length > 0 ? buildCodeFiles(codeSections) : null;
 
-    if (response.code_sections) {
-        displayCodeFiles(response.code_sections);
+    const rawJson = JSON.stringify(response, null, 2);
+    rawText.set('rawResponse', rawJson);
+    if (response.collaborative_analysis) {
+        rawText.set('collaborativeResponse', response.collaborative_analysis);
     }
 
-    document.getElementById('rawResponse').textContent = JSON.stringify(response, null, 2);
+    requestAnimationFrame(() => {
+        if (response.collaborative_analysis) {
+            document.getElementById('collaborativeResponse').textContent = response.collaborative_analysis;
+        }
+        if (modelPanes) {
+            document.getElementById('modelComparison').replaceChildren(...modelPanes);
+        }
+        // Always replaced, so a response without code clears the previous answer's files
+        document.getElementById('codeFilesContainer').replaceChildren(...(codeFiles ? [codeFiles] : []));
+        document.getElementById('rawResponse').textContent = rawJson;
+    });
 }
 
-function displayCodeFiles(codeSections) {
-    const container = document.getElementById('codeFilesContainer');
-    container.innerHTML = '';
+function buildCodeFiles(codeSections) {
+    const frag = document.createDocumentFragment();
 
     for (const [filename, code] of Object.entries(codeSections)) {
         const fileElement = document.createElement('div');
         fileElement.className = 'code-file-container';
-        fileElement.innerHTML = `
-            <div class="code-file-header">
-                <span>📄 ${filename}</span>
-                <button class="copy-file-btn" onclick="copyCodeToClipboard('${filename}')">📋 Copy</button>
-            </div>
-            <div class="code-file-content" id="code-${filename}">
-                ${escapeHtml(code)}
-            </div>
-        `;
-        container.appendChild(fileElement);
+
+        const header = document.createElement('div');
+        header.className = 'code-file-header';
+        const label = document.createElement('span');
+        label.textContent = `📄 ${filename}`;
+        const copyBtn = document.createElement('button');
+        copyBtn.className = 'copy-file-btn';
+        copyBtn.textContent = '📋 Copy';
+        copyBtn.addEventListener('click', () => copyCodeToClipboard(filename));
+        header.append(label, copyBtn);
+
+        const content = document.createElement('div');
+        content.className = 'code-file-content';
+        content.id = `code-${filename}`;
+        content.textContent = code;
+        rawText.set(content.id, code);
+
+        fileElement.append(header, content);
+        frag.appendChild(fileElement);
+    }
+
+    return frag;
+}
+
+function buildModelPane(title, parsed) {
+    const details = document.createElement('details');
+    const summary = document.createElement('summary');
+    summary.textContent = title;
+    const content = document.createElement('div');
+    content.className = 'model-content';
+    if (typeof parsed === 'string') {
+        content.textContent = parsed;
+    } else {
+        content.appendChild(renderSegments(parsed));
+    }
+    details.append(summary, content);
+    return details;
+}
+
+// Split a response into text, emphasis and fenced-code segments in a single walk
+function parseResponse(text) {
+    const segments = [];
+    let last = 0;
+    for (const match of text.matchAll(FORMAT_RE)) {
+        if (match.index > last) {
+            segments.push({ type: 'text', content: text.slice(last, match.index) });
+        }
+        if (match[2] !== undefined) {
+            segments.push({ type: 'code', lang: match[1] || 'text', content: match[2] });
+        } else if (match[3] !== undefined) {
+            segments.push({ type: 'strong', content: match[3] });
+        } else {
+            segments.push({ type: 'em', content: match[4] });
+        }
+        last = match.index + match[0].length;
+    }
+    if (last < text.length) {
+        segments.push({ type: 'text', content: text.slice(last) });
     }
+    return segments;
 }
 
-function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+// Build DOM nodes straight from the segments; model output only ever reaches the page as textContent
+function renderSegments(segments) {
+    const frag = document.createDocumentFragment();
+    for (const segment of segments) {
+        if (segment.type === 'text') {
+            frag.appendChild(document.createTextNode(segment.content));
+        } else if (segment.type === 'code') {
+            const pre = document.createElement('pre');
+            pre.className = 'code-block';
+            const code = document.createElement('code');
+            code.className = `language-${segment.lang}`;
+            code.textContent = segment.content;
+            pre.appendChild(code);
+            frag.appendChild(pre);
+        } else {
+            const emphasis = document.createElement(segment.type);
+            emphasis.textContent = segment.content;
+            frag.appendChild(emphasis);
+        }
+    }
+    return frag;
+}
+
+// Fallback when the server sent no code_sections: take code blocks from the parsed analyses
+function codeSectionsFromSegments(...parsedResponses) {
+    const sections = {};
+    let index = 0;
+    for (const segments of parsedResponses) {
+        if (!segments) continue;
+        for (const segment of segments) {
+            if (segment.type === 'code') {
+                index += 1;
+                sections[`solution_code_${index}.${segment.lang === 'text' ? 'swift' : segment.lang}`] = segment.content;
+            }
+        }
+    }
+    return sections;
 }
 
 function switchTab(tabName) {
@@ -348,8 +510,7 @@ function switchTab(tabName) {
 }
 
 function copyToClipboard(elementId) {
-    const element = document.getElementById(elementId);
-    const text = element.textContent || element.innerText;
+    const text = rawText.get(elementId) ?? document.getElementById(elementId).textContent;
     navigator.clipboard.writeText(text).then(() => {
         showNotification('📋 Copied to clipboard!', 'success');
     }).catch(err => {
@@ -359,8 +520,7 @@ function copyToClipboard(elementId) {
 }
 
 function copyCodeToClipboard(filename) {
-    const codeElement = document.getElementById(`code-${filename}`);
-    const text = codeElement.textContent;
+    const text = rawText.get(`code-${filename}`) ?? document.getElementById(`code-${filename}`).textContent;
     navigator.clipboard.writeText(text).then(() => {
         showNotification(`📋 ${filename} copied!`, 'success');
     }).catch(err => {